@@ -0,0 +1,99 @@
+from typing import Any, List, TypedDict
+
+from langgraph.graph import END, StateGraph, START
+
+from config import RETRIEVE_K, GRADE_MIN_RELEVANT
+from context import pack_context, record_prompt_tokens
+from grading import grade_chunks
+from metrics import instrument_node
+
+
+class GraphState(TypedDict):
+    question:       str
+    qvec:           List[float]
+    vectorstore:    Any
+    generation:     str
+    documents:      List[str]
+    scores:         List[float]
+    links:          List[str]
+    web_results:    List[dict]
+    search_needed:  str
+    pending_search: Any
+    prompt_tokens:  dict
+    doc_keys:       List[str]
+
+
+# ── CRAG GRAPH ─────────────────────────────────────────────────────────────────
+# Nodes close over the shared LLM and web search only; the per-question
+# vectorstore travels in the state, so one compiled graph serves every caller.
+# `grader` answers the relevance checks (a RoutedClassifier in the engine) and
+# defaults to the generating LLM.
+def build_agent(llm, web, speculative=False, grader=None):
+    grader = grader or llm
+
+    def retrieve(state):
+        vectorstore = state.get("vectorstore")
+        hits = vectorstore.similarity_search_with_relevance_scores(
+            state["question"], k=RETRIEVE_K, doc_keys=state.get("doc_keys"), qvec=state.get("qvec")
+        ) if vectorstore else []
+        return {
+            "documents":   [d.page_content for d, _ in hits],
+            "scores":      [s for _, s in hits],
+            "web_results": [],
+            "links":       [],
+        }
+
+    def grade_documents(state):
+        verdicts = grade_chunks(grader, state["question"], state["documents"], state["scores"])
+        relevant = [i for i, ok in enumerate(verdicts) if ok]
+        return {
+            "documents":     [state["documents"][i] for i in relevant],
+            "scores":        [state["scores"][i] for i in relevant],
+            "search_needed": "no" if len(relevant) >= GRADE_MIN_RELEVANT else "yes",
+        }
+
+    # Speculative mode starts the web search alongside grading; the result is
+    # picked up by web_search if grading falls back, otherwise only cached.
+    def grade_speculatively(state):
+        pending = web.speculate(state["question"]) if state["documents"] else None
+        graded  = grade_documents(state)
+        if pending and graded["search_needed"] == "no":
+            web.discard()
+            pending = None
+        return {**graded, "pending_search": pending}
+
+    def web_search(state):
+        pending = state.get("pending_search")
+        results = web.collect(pending) if pending else web.search(state["question"])
+        return {
+            "web_results": results,
+            "links":       [r["url"] for r in results]
+        }
+
+    def generate(state):
+        source  = "PDF document" if state["search_needed"] == "no" else "web search"
+        context = pack_context(state["documents"], state["scores"], state["web_results"])
+        prompt  = (
+            f"Answer the question using the numbered sources below. Cite your source as: {source}.\n\n"
+            f"Sources:\n{context}\n\nQuestion: {state['question']}"
+        )
+        raw_documents = state["documents"] + [r["content"] for r in state["web_results"]]
+        tokens = record_prompt_tokens(f"Context: {raw_documents}\n\nQuestion: {state['question']}", prompt)
+        # Streamed so callers can relay tokens through agent.stream's
+        # "messages" mode; the joined text still lands in the state.
+        res = "".join(chunk.content for chunk in llm.stream(prompt))
+        return {"generation": res, "prompt_tokens": tokens}
+
+    wf = StateGraph(GraphState)
+    wf.add_node("retrieve",   instrument_node("retrieve", retrieve))
+    wf.add_node("grade",      instrument_node("grade", grade_speculatively if speculative else grade_documents))
+    wf.add_node("web_search", instrument_node("web_search", web_search))
+    wf.add_node("generate",   instrument_node("generate", generate))
+    wf.add_edge(START, "retrieve")
+    wf.add_edge("retrieve", "grade")
+    wf.add_conditional_edges("grade",
+        lambda x: "web" if x["search_needed"] == "yes" else "gen",
+        {"web": "web_search", "gen": "generate"})
+    wf.add_edge("web_search", "generate")
+    wf.add_edge("generate",   END)
+    return wf.compile()
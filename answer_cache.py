@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from itertools import count
+
+import numpy as np
+
+from config import ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL_S
+
+
+# ── SEMANTIC ANSWER CACHE ──────────────────────────────────────────────────────
+# Answers are reused for near-duplicate questions about the same document
+# (by index key), compared by cosine similarity of their query embeddings.
+class SemanticCache:
+    def __init__(self, embeddings, threshold=ANSWER_CACHE_THRESHOLD,
+                 max_entries=ANSWER_CACHE_SIZE, ttl_s=ANSWER_CACHE_TTL_S):
+        self.embeddings  = embeddings
+        self.threshold   = threshold
+        self.max_entries = max_entries
+        self.ttl_s       = ttl_s
+        self.stats       = Counter()
+        self._entries    = OrderedDict()
+        self._ids        = count()
+        self._lock       = threading.Lock()
+
+    def embed(self, question):
+        v = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return v / (np.linalg.norm(v) or 1.0)
+
+    def lookup(self, doc_key, vector):
+        now = time.monotonic()
+        with self._lock:
+            for eid in [e for e, entry in self._entries.items() if now - entry["at"] > self.ttl_s]:
+                del self._entries[eid]
+            ids = [e for e, entry in self._entries.items() if entry["doc"] == doc_key]
+            if ids:
+                sims = np.stack([self._entries[e]["vector"] for e in ids]) @ vector
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    self._entries.move_to_end(ids[best])
+                    self.stats["hits"] += 1
+                    return {**self._entries[ids[best]], "similarity": float(sims[best])}
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, doc_key, vector, question, answer, links):
+        with self._lock:
+            self._entries[next(self._ids)] = {
+                "doc": doc_key, "vector": vector, "question": question,
+                "answer": answer, "links": links, "at": time.monotonic(),
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
@@ -1,15 +1,16 @@
 import streamlit as st
 import os
-from datetime import datetime
-from typing import List, TypedDict
-
-from langchain_groq import ChatGroq
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langgraph.graph import END, StateGraph, START
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+import threading
+import time
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from batch import read_questions, to_csv, to_jsonl
+from config import BATCH_MAX_QUESTIONS, METRICS_PORT, PREWARM
+from context import CONTEXT_STATS
+from grading import GRADER_STATS
+from metrics import serve_metrics
+from search import SEARCH_STATS
 
 st.set_page_config(page_title="Dani Tech · RAG", page_icon="✦", layout="wide")
 
@@ -543,10 +544,55 @@ button[data-testid="stBaseButton-headerNoPadding"] span.css-1aehpvj,
 """, unsafe_allow_html=True)
 
 
+# ── RESOURCES ──────────────────────────────────────────────────────────────────
+# The engine (models, indexes, caches, compiled graph) is built once per process
+# and shared by every session; reruns only pay a lookup. Nothing imports it
+# before it is needed, so the welcome screen skips langgraph, Chroma, Groq and
+# the embedding model; a pre-warm already under way is waited for, not repeated.
+@st.cache_resource(show_spinner=False)
+def load_engine(groq_key, tavily_key):
+    if PREWARM:
+        prewarm().join()
+    from engine import Engine
+
+    return Engine(groq_key, tavily_key)
+
+
+# Started once per process after the first page has been sent; the import
+# itself happens on the thread, so the script never waits for it.
+@st.cache_resource(show_spinner=False)
+def prewarm():
+    def warm():
+        from engine import prewarm
+        prewarm()
+
+    thread = threading.Thread(target=warm, name="rag-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+# Streamlit has no routes of its own, so Prometheus scrapes a side port.
+@st.cache_resource(show_spinner=False)
+def metrics_server(port):
+    return serve_metrics(port)
+
+if METRICS_PORT:
+    metrics_server(METRICS_PORT)
+
+
 # ── RESET ──────────────────────────────────────────────────────────────────────
+# Clearing or replacing the document also lets go of its in-memory index.
+def session_id():
+    return get_script_run_ctx().session_id
+
+
 def clear_retriever():
-    if "retriever" in st.session_state:
-        del st.session_state.retriever
+    from engine import resident_indexes
+
+    resident_indexes().release(session_id())
+    for k in ("doc_key", "doc_name", "ingest_job", "corpus_added"):
+        if k in st.session_state:
+            del st.session_state[k]
     if "messages" in st.session_state:
         st.session_state.messages = []
 
@@ -573,11 +619,23 @@ with st.sidebar:
 
     st.divider()
 
-    uploaded_file = st.file_uploader(
-        "Upload PDF", type="pdf",
-        on_change=clear_retriever,
-        help="Drop your research paper here"
+    corpus_mode = st.checkbox(
+        "Shared corpus", value=False, on_change=clear_retriever,
+        help="Add PDFs to one persistent corpus shared by every session and search any subset of it"
     )
+    if corpus_mode:
+        uploaded_file = None
+        corpus_files  = st.file_uploader(
+            "Add PDFs to corpus", type="pdf", accept_multiple_files=True,
+            help="Documents already in the corpus are not indexed again"
+        )
+    else:
+        corpus_files  = []
+        uploaded_file = st.file_uploader(
+            "Upload PDF", type="pdf",
+            on_change=clear_retriever,
+            help="Drop your research paper here"
+        )
 
     st.markdown("<div style='height:8px'></div>", unsafe_allow_html=True)
 
@@ -588,13 +646,15 @@ with st.sidebar:
             st.rerun()
     with col2:
         show_graph = st.checkbox("Graph", value=False)
+    show_debug = st.checkbox("Debug timings", value=False)
 
     st.markdown("<div class='side-footer'>✦ Built by Dani Tech</div>", unsafe_allow_html=True)
 
 
 # ── HERO ───────────────────────────────────────────────────────────────────────
-doc_ready = "retriever" in st.session_state
-pill_text = "System Active · Document Loaded" if doc_ready else "System Active · Awaiting Document"
+doc_ready = "doc_key" in st.session_state or corpus_mode
+pill_text = ("System Active · Shared Corpus" if corpus_mode else
+             "System Active · Document Loaded" if doc_ready else "System Active · Awaiting Document")
 
 st.markdown(f"""
 <div class='hero'>
@@ -658,78 +718,153 @@ st.markdown("""
 if groq_key and tavily_key:
     os.environ["GROQ_API_KEY"]   = groq_key
     os.environ["TAVILY_API_KEY"] = tavily_key
-    llm        = ChatGroq(model="llama-3.3-70b-versatile", temperature=0)
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-
-    if uploaded_file and "retriever" not in st.session_state:
-        with st.status("✦  Indexing your document…", expanded=True) as status:
-            with open("temp.pdf", "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            loader = PyPDFLoader("temp.pdf")
-            chunks = RecursiveCharacterTextSplitter(
-                chunk_size=800, chunk_overlap=100
-            ).split_documents(loader.load())
-            status.write(f"Creating embeddings for {len(chunks)} chunks…")
-            vectorstore = Chroma.from_documents(
-                documents=chunks,
-                embedding=embeddings,
-                collection_name=f"pdf_{int(datetime.now().timestamp())}"
-            )
-            st.session_state.retriever = vectorstore.as_retriever()
-            status.update(label=f"✦  Ready — {uploaded_file.name}", state="complete")
-
-    class GraphState(TypedDict):
-        question:      str
-        generation:    str
-        documents:     List[str]
-        links:         List[str]
-        search_needed: str
-
-    def retrieve(state):
-        docs = st.session_state.retriever.invoke(state["question"]) if "retriever" in st.session_state else []
-        return {"documents": [d.page_content for d in docs], "links": []}
-
-    def grade_documents(state):
-        if not state["documents"]:
-            return {"search_needed": "yes"}
-        score = llm.invoke(
-            f"Is this context relevant to the question? Answer only yes or no.\n"
-            f"Question: {state['question']}\nContext: {state['documents'][0]}"
-        ).content.lower()
-        return {"search_needed": "no" if "yes" in score else "yes"}
-
-    def web_search(state):
-        results = TavilySearchResults(k=3).invoke({"query": state["question"]})
-        return {
-            "documents": state["documents"] + [r["content"] for r in results],
-            "links":     [r["url"] for r in results]
-        }
-
-    def generate(state):
-        source = "PDF document" if state["search_needed"] == "no" else "web search"
-        res = llm.invoke(
-            f"Answer the question using the context below. Cite your source as: {source}.\n\n"
-            f"Context: {state['documents']}\n\nQuestion: {state['question']}"
-        ).content
-        return {"generation": res}
-
-    wf = StateGraph(GraphState)
-    wf.add_node("retrieve",   retrieve)
-    wf.add_node("grade",      grade_documents)
-    wf.add_node("web_search", web_search)
-    wf.add_node("generate",   generate)
-    wf.add_edge(START, "retrieve")
-    wf.add_edge("retrieve", "grade")
-    wf.add_conditional_edges("grade",
-        lambda x: "web" if x["search_needed"] == "yes" else "gen",
-        {"web": "web_search", "gen": "generate"})
-    wf.add_edge("web_search", "generate")
-    wf.add_edge("generate",   END)
-    agent = wf.compile()
+    setup_t0 = time.perf_counter()
+    engine   = load_engine(groq_key, tavily_key)
+    setup_ms = (time.perf_counter() - setup_t0) * 1000
+    engine.resident.reap(Runtime.instance().is_active_session)
+
+    if uploaded_file and "doc_key" not in st.session_state:
+        key = engine.ingest(uploaded_file.getvalue(), uploaded_file.name)
+        st.session_state.doc_key  = key
+        st.session_state.doc_name = uploaded_file.name
+        engine.resident.acquire(key, session_id())
+        if engine.is_indexing(key):
+            st.session_state.ingest_job = key
+        else:
+            st.toast(f"✦  Attached previously indexed copy of {uploaded_file.name}")
+
+    # Refreshes on its own while the rest of the page, including chat, stays
+    # usable against the pages indexed so far.
+    @st.fragment(run_every=1.0)
+    def ingest_progress():
+        key = st.session_state.get("ingest_job")
+        if key is None:
+            return
+        job   = engine.document_status(key)
+        done  = job["state"] != "indexing"
+        label = (f"✦  Indexing failed — {job['error']}" if job["state"] == "error" else
+                 f"✦  Ready — {st.session_state.doc_name}" if done else
+                 f"✦  Indexing {st.session_state.doc_name}… answers use pages indexed so far")
+        state = {"error": "error", "indexing": "running"}.get(job["state"], "complete")
+        with st.status(label, expanded=not done, state=state) as status:
+            if "counts" in job:
+                counts, rate = job["counts"], job["throughput"]
+                status.write(f"Parse  · {counts.get('pages', 0)} pages · {rate['parse']:.1f} pages/s")
+                status.write(f"Split  · {counts.get('chunks', 0)} chunks · {rate['split']:.0f} chunks/s")
+                status.write(f"Embed  · {counts.get('embedded', 0)} chunks · {rate['embed']:.1f} chunks/s")
+                status.write(f"Elapsed {job['elapsed']:.1f} s")
+        if done and job["state"] != "error":
+            del st.session_state.ingest_job
+            st.rerun()
+
+    ingest_progress()
+
+    corpus_scope = None
+    if corpus_mode:
+        added = st.session_state.setdefault("corpus_added", set())
+        for f in corpus_files:
+            if f.file_id not in added:
+                engine.add_to_corpus(f.getvalue(), f.name)
+                added.add(f.file_id)
+
+        @st.fragment(run_every=1.0)
+        def corpus_progress():
+            indexing = [d for d in engine.corpus_documents() if d["state"] == "indexing"]
+            if indexing:
+                st.session_state.corpus_indexing = True
+                with st.status(f"✦  Indexing {len(indexing)} document(s) into the corpus…", state="running"):
+                    for d in indexing:
+                        st.write(f"{d['name']} · {d['counts'].get('pages', 0)} pages · "
+                                 f"{d['counts'].get('embedded', 0)} chunks")
+            elif st.session_state.pop("corpus_indexing", False):
+                st.rerun()
+
+        corpus_progress()
+        with st.sidebar:
+            docs         = engine.corpus_documents()
+            names        = {d["key"]: d["name"] for d in docs if d["state"] != "error"}
+            for d in docs:
+                if d["state"] == "error":
+                    st.warning(f"✦  {d['name']} was not added to the corpus — {d['error']}")
+            corpus_scope = st.multiselect("Search in", options=list(names), format_func=names.get,
+                                          placeholder="All corpus documents")
+            summary = engine.corpus.summary()
+            st.caption(f"✦  Corpus {summary['documents']} documents · {summary['chunks']:,} chunks")
+
+    from engine import BUILD_TIMES
+
+    with st.sidebar:
+        cold_s = sum(BUILD_TIMES.values())
+        st.caption(f"✦  Setup {setup_ms:.0f} ms this run · {cold_s:.1f} s cold build")
+        idx = engine.store.summary()
+        st.caption(
+            f"✦  Index cache {idx['hits']} hits · {idx['rebuilds']} builds · "
+            f"{idx['indexes']} stored ({idx['bytes'] / 2**20:.1f} MB)"
+        )
+        resident = engine.resident.summary()
+        st.caption(
+            f"✦  In memory {resident['resident']} indexes ({resident['bytes'] / 2**20:.1f} MB) · "
+            f"{resident['sessions']} sessions"
+        )
+        st.caption(
+            f"✦  Chunk embeddings {engine.embeddings.stats['hits']} cached · "
+            f"{engine.embeddings.stats['computed']} computed"
+        )
+        st.caption(
+            f"✦  Grader {GRADER_STATS['graded_locally']} LLM calls avoided · "
+            f"{GRADER_STATS['escalated']} escalated"
+        )
+        st.caption(
+            f"✦  Web search {SEARCH_STATS['cache_hits']} cached · "
+            f"{SEARCH_STATS['speculative_used']}/{SEARCH_STATS['speculative_launched']} speculative used · "
+            f"{SEARCH_STATS['latency_saved_ms'] / 1000:.1f} s saved"
+        )
+        st.caption(
+            f"✦  Prompt context {CONTEXT_STATS['raw_tokens']:,} → "
+            f"{CONTEXT_STATS['packed_tokens']:,} est. tokens after packing"
+        )
+        answers = engine.answers
+        st.caption(
+            f"✦  Answer cache {answers.hit_rate():.0%} hit rate · "
+            f"{answers.stats['hits']}/{answers.stats['hits'] + answers.stats['misses']} questions"
+        )
 
     if show_graph:
         with st.sidebar:
-            st.image(agent.get_graph().draw_mermaid_png())
+            st.image(engine.agent.get_graph().draw_mermaid_png())
+
+    # ── BATCH ──────────────────────────────────────────────────────────────────
+    # A file of questions runs concurrently against the current document or
+    # corpus selection; the table fills in as answers arrive.
+    def batch_table(results):
+        return [{"#": r["index"] + 1, "question": r["question"], "answer": r["error"] or r["answer"],
+                 "links": len(r["links"]), "ms": round(r["latency_ms"]), "cached": r["cached"] is not None}
+                for r in sorted(results, key=lambda r: r["index"])]
+
+    with st.expander("✦  Batch questions"):
+        batch_file = st.file_uploader(
+            "Questions file", type=["csv", "jsonl", "txt"],
+            on_change=lambda: st.session_state.pop("batch_results", None),
+            help="CSV with a question column, JSONL of {\"question\": ...} or one question per line"
+        )
+        table = st.empty()
+        if batch_file and st.button("Run batch"):
+            questions = read_questions(batch_file.getvalue(), batch_file.name)
+            if len(questions) > BATCH_MAX_QUESTIONS:
+                st.warning(f"Running the first {BATCH_MAX_QUESTIONS} of {len(questions)} questions")
+                questions = questions[:BATCH_MAX_QUESTIONS]
+            progress, results = st.progress(0.0), []
+            for result in engine.batch(questions, st.session_state.get("doc_key"), corpus_scope):
+                results.append(result)
+                progress.progress(len(results) / len(questions), text=f"{len(results)}/{len(questions)} answered")
+                table.dataframe(batch_table(results), hide_index=True)
+            st.session_state.batch_results = results
+        results = st.session_state.get("batch_results")
+        if results:
+            table.dataframe(batch_table(results), hide_index=True)
+            col1, col2 = st.columns(2)
+            col1.download_button("⤓  CSV", to_csv(results), "answers.csv", "text/csv")
+            col2.download_button("⤓  JSONL", to_jsonl(results), "answers.jsonl", "application/x-ndjson")
 
     # ── CHAT ───────────────────────────────────────────────────────────────────
     st.markdown("""
@@ -743,7 +878,16 @@ if groq_key and tavily_key:
         with st.chat_message(msg["role"]):
             st.markdown(msg["content"])
 
-    if prompt := st.chat_input("Ask anything about your document…"):
+    # A failed upload's partial index is never answered from; re-uploading
+    # the file retries it.
+    doc_status = (engine.document_status(st.session_state.doc_key)
+                  if "doc_key" in st.session_state and not corpus_mode else {})
+    doc_failed = doc_status.get("state") == "error"
+    if doc_failed:
+        st.error(f"✦  Indexing {st.session_state.doc_name} failed — {doc_status['error']}. "
+                 f"Remove the file and upload it again to retry.")
+
+    if prompt := st.chat_input("Ask anything about your document…", disabled=doc_failed):
         st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
@@ -755,24 +899,56 @@ if groq_key and tavily_key:
                 "web_search": "Searching the web…",
                 "generate":   "Composing your answer…",
             }
-            with st.status("✦  Thinking…", expanded=True) as status:
-                final_state = {}
-                for step in agent.stream({"question": prompt}):
-                    for node, output in step.items():
-                        status.write(f"→  {node_labels.get(node, node)}")
-                        final_state.update(output)
-                status.update(label="✦  Done", state="complete")
-
-            st.markdown(final_state["generation"])
-
-            if final_state.get("links"):
+            status = st.status("✦  Thinking…", expanded=True)
+            done   = {}
+
+            def answer_tokens():
+                composing = False
+                for event in engine.stream(prompt, st.session_state.get("doc_key"), corpus_scope):
+                    if event["type"] == "node" and event["node"] != "generate":
+                        status.write(f"→  {node_labels.get(event['node'], event['node'])}")
+                    elif event["type"] == "token":
+                        if not composing:
+                            composing = True
+                            status.write(f"→  {node_labels['generate']}")
+                            status.update(label="✦  Writing…", expanded=False)
+                        yield event["text"]
+                    elif event["type"] == "done":
+                        done.update(event)
+
+            answer = st.write_stream(answer_tokens())
+            if not answer:
+                answer = done["answer"]
+                st.markdown(answer)
+            if done["cached"]:
+                status.update(label=f"✦  Answered from cache · {done['cached']:.2f} match",
+                              state="complete", expanded=False)
+            else:
+                if done["prompt_tokens"]:
+                    tokens = done["prompt_tokens"]
+                    status.write(f"→  Context {tokens['raw']:,} → {tokens['packed']:,} est. tokens")
+                status.update(label="✦  Done", state="complete", expanded=False)
+            links = done["links"]
+
+            if show_debug:
+                trace = done["trace"]
+                with st.expander(f"✦  Timings · {trace['total_ms']:.0f} ms"):
+                    for span in trace["spans"]:
+                        extra = f" · {span['tokens']} tokens" if span.get("tokens") else ""
+                        extra += f" · {span['model']}" if span.get("model") else ""
+                        st.text(f"{span['kind']:<8} {span['name']:<16} {span['ms']:8.1f} ms{extra}")
+                    for node, t in trace["tokens"].items():
+                        st.text(f"tokens   {node:<16} {t['input']} in · {t['output']} out · {t['calls']} calls")
+                    for model, t in trace.get("models", {}).items():
+                        st.text(f"model    {model:<24} {t['input']} in · {t['output']} out · {t['calls']} calls · "
+                                f"{t['ms']:.0f} ms")
+
+            if links:
                 with st.expander("✦  Web Sources"):
-                    for link in final_state["links"]:
+                    for link in links:
                         st.write(f"↗  {link}")
 
-        st.session_state.messages.append(
-            {"role": "assistant", "content": final_state["generation"]}
-        )
+        st.session_state.messages.append({"role": "assistant", "content": answer})
 
 else:
     st.markdown("""
@@ -795,3 +971,10 @@ else:
         </div>
     </div>
     """, unsafe_allow_html=True)
+
+
+# ── PRE-WARM ───────────────────────────────────────────────────────────────────
+# Loads the engine's stacks and embedding model while the user reads the page
+# or types their keys.
+if PREWARM:
+    prewarm()
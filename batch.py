@@ -0,0 +1,45 @@
+import csv
+import io
+import json
+
+FIELDS = ["index", "question", "answer", "links", "latency_ms", "cached", "duplicate_of", "error"]
+
+
+# ── QUESTION FILES ─────────────────────────────────────────────────────────────
+# A CSV with a `question` column (or questions in its first column, without a
+# header), JSONL of {"question": ...} objects or strings, or plain text with
+# one question per line. Blank questions are dropped.
+def read_questions(data, name=""):
+    text = data.decode("utf-8-sig")
+    kind = name.lower().rsplit(".", 1)[-1]
+    if kind == "jsonl":
+        rows      = [json.loads(line) for line in text.splitlines() if line.strip()]
+        questions = [row["question"] if isinstance(row, dict) else str(row) for row in rows]
+    elif kind == "csv":
+        rows      = list(csv.reader(io.StringIO(text)))
+        header    = [c.strip().lower() for c in rows[0]] if rows else []
+        col       = header.index("question") if "question" in header else 0
+        body      = rows[1:] if "question" in header else rows
+        questions = [row[col] for row in body if len(row) > col]
+    else:
+        questions = text.splitlines()
+    return [q.strip() for q in questions if q.strip()]
+
+
+# ── EXPORT ─────────────────────────────────────────────────────────────────────
+# Results in input order; links are space-separated in CSV.
+def _ordered(results):
+    return sorted(results, key=lambda r: r["index"])
+
+
+def to_csv(results):
+    out    = io.StringIO()
+    writer = csv.DictWriter(out, FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for r in _ordered(results):
+        writer.writerow({**r, "links": " ".join(r["links"]), "latency_ms": round(r["latency_ms"], 1)})
+    return out.getvalue()
+
+
+def to_jsonl(results):
+    return "".join(json.dumps({k: r.get(k) for k in FIELDS}) + "\n" for r in _ordered(results))
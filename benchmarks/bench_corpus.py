@@ -0,0 +1,106 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import FILLER, SUBJECTS
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] if values else 0.0
+
+
+def synthetic_chunks(doc, chunks, rng):
+    from langchain_core.documents import Document
+
+    key = f"doc{doc:06d}"
+    return key, [
+        Document(page_content=f"Part {rng.choice(SUBJECTS)}-{doc}-{c} " + " ".join(rng.choices(FILLER, k=60)),
+                 metadata={"doc_key": key, "source": f"{key}.pdf", "page": c})
+        for c in range(chunks)
+    ]
+
+
+# ── CORPUS SCALE BENCHMARK ─────────────────────────────────────────────────────
+# Grows one shared corpus to each scale in turn, then measures query latency
+# unfiltered, filtered to a few documents, and dense-only, plus HNSW recall@k
+# against exact search over the stored vectors. HNSW parameters are fixed once
+# chromadb has loaded the index, so compare settings across separate runs.
+def measure(corpus, keys, queries, k, filter_docs, rng):
+    collection = corpus.index.vectorstore._collection
+    data    = collection.get(include=["embeddings"])
+    vectors = np.asarray(data["embeddings"], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    embed   = corpus.index.vectorstore.embeddings
+
+    timings = {"hybrid": [], "filtered": [], "dense": []}
+    recall  = []
+    for q in queries:
+        for mode, kwargs in (("hybrid", {}), ("dense", {"lexical_weight": 0}),
+                             ("filtered", {"doc_keys": rng.sample(keys, min(filter_docs, len(keys)))})):
+            t0 = time.perf_counter()
+            corpus.index.similarity_search_with_relevance_scores(q, k=k, **kwargs)
+            timings[mode].append(time.perf_counter() - t0)
+        qvec  = np.asarray(embed.embed_query(q), dtype=np.float32)
+        exact = {data["ids"][i] for i in np.argsort(-(vectors @ (qvec / np.linalg.norm(qvec))))[:k]}
+        ann   = collection.query(query_embeddings=[qvec.tolist()], n_results=k)["ids"][0]
+        recall.append(len(exact & set(ann)) / k)
+    return {mode: (pct(t, 50) * 1000, pct(t, 95) * 1000) for mode, t in timings.items()}, float(np.mean(recall))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Query latency and HNSW recall of the shared corpus as it grows.")
+    ap.add_argument("--scales", default="100,1000,5000", help="comma-separated document counts")
+    ap.add_argument("--chunks-per-doc", type=int, default=8)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--filter-docs", type=int, default=5, help="documents selected in the filtered run")
+    ap.add_argument("--m", type=int, help="HNSW M (default: RAG_CORPUS_HNSW_M)")
+    ap.add_argument("--construction-ef", type=int, help="default: RAG_CORPUS_HNSW_CONSTRUCTION_EF")
+    ap.add_argument("--search-ef", type=int, help="default: RAG_CORPUS_HNSW_SEARCH_EF")
+    args = ap.parse_args()
+
+    os.environ["RAG_CORPUS_DIR"] = tempfile.mkdtemp(prefix="rag-bench-corpus-")
+    for name, value in (("M", args.m), ("CONSTRUCTION_EF", args.construction_ef), ("SEARCH_EF", args.search_ef)):
+        if value:
+            os.environ[f"RAG_CORPUS_HNSW_{name}"] = str(value)
+
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from config import CORPUS_HNSW_M, CORPUS_HNSW_CONSTRUCTION_EF, CORPUS_HNSW_SEARCH_EF
+    from corpus import Corpus
+
+    rng    = random.Random(0)
+    corpus = Corpus(DeterministicFakeEmbedding(size=args.dim))
+    keys   = []
+    print(f"HNSW M={CORPUS_HNSW_M} construction_ef={CORPUS_HNSW_CONSTRUCTION_EF} search_ef={CORPUS_HNSW_SEARCH_EF}")
+    print(f"{'docs':>7}  {'chunks':>8}  {'add/s':>7}  {'recall':>6}  "
+          f"{'hybrid p50/p95 ms':>17}  {'filtered p50/p95':>16}  {'dense p50/p95':>13}")
+    for scale in [int(s) for s in args.scales.split(",")]:
+        t0, added = time.perf_counter(), 0
+        for doc in range(len(keys), scale):
+            key, chunks = synthetic_chunks(doc, args.chunks_per_doc, rng)
+            corpus.index.add_documents(chunks)
+            corpus.commit(key, f"{key}.pdf", len(chunks), save=False)
+            keys.append(key)
+            added += len(chunks)
+        corpus.save()
+        rate    = added / max(time.perf_counter() - t0, 1e-9)
+        queries = [f"Part {rng.choice(SUBJECTS)}-{rng.randrange(scale)}-{rng.randrange(args.chunks_per_doc)}"
+                   for _ in range(args.queries)]
+        lat, recall = measure(corpus, keys, queries, args.k, args.filter_docs, rng)
+        print(f"{scale:>7}  {len(corpus.index.lexical):>8}  {rate:>7.0f}  {recall:>6.0%}  "
+              f"{lat['hybrid'][0]:>8.1f}/{lat['hybrid'][1]:<8.1f}  "
+              f"{lat['filtered'][0]:>7.1f}/{lat['filtered'][1]:<8.1f}  "
+              f"{lat['dense'][0]:>6.1f}/{lat['dense'][1]:<6.1f}")
+
+
+if __name__ == "__main__":
+    main()
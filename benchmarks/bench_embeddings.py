@@ -0,0 +1,92 @@
+import argparse
+import os
+import random
+import sys
+import time
+from multiprocessing import get_context
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_corpus import synthetic_chunks
+from bench_quantized import rss_mb
+
+
+def normalized(vectors):
+    v = np.asarray(vectors, dtype=np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+# Runs in a fresh process per backend, so load time and resident memory
+# include importing the runtime. The first batch is a warm-up, untimed.
+def measure(model, backend, quantize, threads, batch_size, texts, queries):
+    from embeddings import base_embeddings
+
+    base    = rss_mb()[0]
+    t0      = time.perf_counter()
+    embed   = base_embeddings(model, backend, quantize, threads, batch_size)
+    loaded  = time.perf_counter() - t0
+    embed.embed_documents(texts[:batch_size])
+    t0      = time.perf_counter()
+    vectors = embed.embed_documents(texts)
+    encode  = time.perf_counter() - t0
+    t0      = time.perf_counter()
+    qvecs   = [embed.embed_query(q) for q in queries]
+    return {
+        "load_s":   loaded,
+        "per_s":    len(texts) / encode,
+        "query_ms": (time.perf_counter() - t0) / len(queries) * 1000,
+        "rss_mb":   rss_mb()[0] - base,
+        "vectors":  normalized(vectors),
+        "queries":  normalized(qvecs),
+    }
+
+
+# ── EMBEDDING BACKEND BENCHMARK ────────────────────────────────────────────────
+# The same model through each backend ("torch", "onnx", "onnx:<quantization>"):
+# load time, document embeddings/s at the configured batch size, single query
+# latency, anonymous RSS growth, and agreement with the first backend listed,
+# as the mean cosine between their vectors and the overlap of their top-k
+# chunks for each query.
+def main():
+    from config import EMBED_MODEL, EMBED_THREADS, EMBED_BATCH_SIZE
+
+    ap = argparse.ArgumentParser(description="Compare embedding backends on the same model.")
+    ap.add_argument("--backends", default="torch,onnx,onnx:avx512_vnni")
+    ap.add_argument("--model", default=EMBED_MODEL)
+    ap.add_argument("--chunks", type=int, default=2000)
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--threads", type=int, default=EMBED_THREADS, help="intra-op threads (0: runtime default)")
+    ap.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    args = ap.parse_args()
+
+    from fixtures import SUBJECTS
+
+    rng     = random.Random(0)
+    texts   = [c.page_content for doc in range(args.chunks // 10)
+               for c in synthetic_chunks(doc, 10, rng)[1]]
+    queries = [f"Part {rng.choice(SUBJECTS)}-{rng.randrange(args.chunks // 10)}-{rng.randrange(10)}"
+               for _ in range(args.queries)]
+
+    print(f"{args.model} · {len(texts)} chunks · batch {args.batch_size} · threads {args.threads or 'default'}")
+    print(f"{'backend':<20}  {'load s':>6}  {'emb/s':>7}  {'query ms':>8}  {'RSS +MB':>7}  {'cosine':>6}  "
+          f"{'top-k':>5}")
+    ctx, reference = get_context("spawn"), None
+    for spec in args.backends.split(","):
+        backend, _, quantize = spec.partition(":")
+        with ctx.Pool(1) as pool:
+            r = pool.apply(measure, (args.model, backend, quantize, args.threads, args.batch_size, texts, queries))
+        reference = reference or r
+        cosine    = float(np.mean(np.sum(r["vectors"] * reference["vectors"], axis=1)))
+        overlap   = np.mean([
+            len(set(np.argsort(-(r["vectors"] @ q))[:args.k]) & set(np.argsort(-(reference["vectors"] @ p))[:args.k]))
+            / args.k for q, p in zip(r["queries"], reference["queries"])
+        ])
+        print(f"{spec:<20}  {r['load_s']:>6.1f}  {r['per_s']:>7.0f}  {r['query_ms']:>8.1f}  {r['rss_mb']:>7.0f}  "
+              f"{cosine:>6.3f}  {overlap:>5.0%}")
+
+
+if __name__ == "__main__":
+    main()
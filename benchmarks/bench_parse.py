@@ -0,0 +1,54 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import _extract_range, iter_pages
+
+
+# ── PDF PARSE BENCHMARK ────────────────────────────────────────────────────────
+# Pages/sec for the serial loader (1 worker) against the process pool at 2..N
+# workers. Pools are warmed first so worker start-up is reported separately.
+def run(path, workers):
+    if workers == 1:
+        t0 = time.perf_counter()
+        pages = sum(1 for _ in iter_pages(path))
+        return 0.0, pages, time.perf_counter() - t0
+
+    t0   = time.perf_counter()
+    pool = ProcessPoolExecutor(workers, mp_context=get_context("spawn"))
+    list(pool.map(_extract_range, [path] * workers, [0] * workers, [1] * workers))
+    warm = time.perf_counter() - t0
+    try:
+        t0 = time.perf_counter()
+        pages = sum(1 for _ in iter_pages(path, pool, min_pages=0, window=2 * workers))
+        return warm, pages, time.perf_counter() - t0
+    finally:
+        pool.shutdown()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare serial and process-pool PDF parsing.")
+    ap.add_argument("pdf")
+    ap.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'workers':>7}  {'pages':>6}  {'best s':>8}  {'pages/s':>9}  {'speedup':>7}  {'warm-up s':>9}")
+    base = None
+    for n in range(1, args.max_workers + 1):
+        runs  = [run(args.pdf, n) for _ in range(args.repeat)]
+        warm  = min(r[0] for r in runs)
+        pages = runs[0][1]
+        best  = min(r[2] for r in runs)
+        rate  = pages / best
+        base  = base or rate
+        print(f"{n:>7}  {pages:>6}  {best:>8.2f}  {rate:>9.1f}  {rate / base:>6.2f}x  {warm:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from multiprocessing import get_context
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_corpus import pct, synthetic_chunks
+
+
+def build(root, storage, dim, docs, chunks_per_doc):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from corpus import Corpus
+
+    rng    = random.Random(0)
+    corpus = Corpus(DeterministicFakeEmbedding(size=dim), root=root, storage=storage)
+    for doc in range(docs):
+        key, chunks = synthetic_chunks(doc, chunks_per_doc, rng)
+        corpus.index.add_documents(chunks)
+        corpus.commit(key, f"{key}.pdf", len(chunks), save=False)
+    corpus.save()
+
+
+# Anonymous and file-backed resident MB. Current values rather than the peak
+# (a spawned child inherits its parent's); memory-mapped floats the re-rank
+# touched count as file-backed page cache, which the kernel can reclaim.
+def rss_mb():
+    with open("/proc/self/status") as f:
+        rows = dict(line.split(":", 1) for line in f if line.startswith(("RssAnon", "RssFile")))
+    return int(rows["RssAnon"].split()[0]) / 1024, int(rows["RssFile"].split()[0]) / 1024
+
+
+# Runs in a fresh process per storage mode, measuring how much opening and
+# querying the corpus adds to its resident memory.
+def query(root, storage, dim, queries, k):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from corpus import Corpus
+    from hybrid import CHROMA_OPEN_BYTES
+
+    base   = rss_mb()
+    corpus = Corpus(DeterministicFakeEmbedding(size=dim), root=root, storage=storage)
+    index  = corpus.index
+    bytes_ = index.resident_bytes() - CHROMA_OPEN_BYTES
+    timings, hits = [], []
+    for q in queries:
+        t0    = time.perf_counter()
+        found = index.similarity_search_with_relevance_scores(q, k=k, lexical_weight=0)
+        timings.append(time.perf_counter() - t0)
+        hits.append([d.page_content for d, _ in found])
+    return {
+        "bytes":  bytes_,
+        "chunks": len(index.lexical),
+        "p50_ms": pct(timings, 50) * 1000,
+        "p95_ms": pct(timings, 95) * 1000,
+        "rss_mb": [now - before for now, before in zip(rss_mb(), base)],
+        "hits":   hits,
+    }
+
+
+# ── QUANTIZED STORAGE BENCHMARK ────────────────────────────────────────────────
+# The same synthetic corpus stored with float vectors in Chroma and as int8
+# codes with a memory-mapped float re-rank: estimated resident bytes per
+# chunk (without Chroma's fixed per-directory cost), RSS growth of a process
+# that opens and queries it (Linux), dense query latency and recall@k against exact
+# search over the float vectors.
+def main():
+    ap = argparse.ArgumentParser(description="Compare float and int8 quantized vector storage.")
+    ap.add_argument("--docs", type=int, default=2000)
+    ap.add_argument("--chunks-per-doc", type=int, default=10)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--rerank", type=int, help="default: RAG_QUANTIZED_RERANK")
+    args = ap.parse_args()
+
+    if args.rerank:
+        os.environ["RAG_QUANTIZED_RERANK"] = str(args.rerank)
+    work = tempfile.mkdtemp(prefix="rag-bench-quantized-")
+
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from config import QUANTIZED_RERANK
+    from fixtures import SUBJECTS
+
+    rng     = random.Random(1)
+    total   = args.docs * args.chunks_per_doc
+    queries = [f"Part {rng.choice(SUBJECTS)}-{rng.randrange(args.docs)}-{rng.randrange(args.chunks_per_doc)}"
+               for _ in range(args.queries)]
+
+    # Exact top-k by text (ids differ between the two stores); build() draws
+    # the same chunks from the same seed.
+    embed   = DeterministicFakeEmbedding(size=args.dim)
+    chunks  = random.Random(0)
+    texts   = [c.page_content for doc in range(args.docs)
+               for c in synthetic_chunks(doc, args.chunks_per_doc, chunks)[1]]
+    vectors = np.asarray(embed.embed_documents(texts), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    exact   = []
+    for q in queries:
+        qvec = np.asarray(embed.embed_query(q), dtype=np.float32)
+        exact.append({texts[i] for i in np.argsort(-(vectors @ (qvec / np.linalg.norm(qvec))))[:args.k]})
+
+    print(f"{total} chunks · dim {args.dim} · k={args.k} · int8 re-ranks {QUANTIZED_RERANK}")
+    print(f"{'storage':<8}  {'build s':>7}  {'bytes/chunk':>11}  {'anon +MB':>8}  {'file +MB':>8}  "
+          f"{'p50 ms':>7}  {'p95 ms':>7}  {'recall':>6}")
+    ctx = get_context("spawn")
+    for storage in ("float", "int8"):
+        root = os.path.join(work, storage)
+        t0   = time.perf_counter()
+        with ctx.Pool(1) as pool:
+            pool.apply(build, (root, storage, args.dim, args.docs, args.chunks_per_doc))
+        built = time.perf_counter() - t0
+        with ctx.Pool(1) as pool:
+            r = pool.apply(query, (root, storage, args.dim, queries, args.k))
+        recall = np.mean([len(e & set(h)) / args.k for e, h in zip(exact, r["hits"])])
+        print(f"{storage:<8}  {built:>7.1f}  {r['bytes'] / r['chunks']:>11.0f}  {r['rss_mb'][0]:>8.0f}  {r['rss_mb'][1]:>8.0f}  "
+              f"{r['p50_ms']:>7.1f}  {r['p95_ms']:>7.1f}  {recall:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ["torch", "transformers", "sentence_transformers", "onnxruntime", "chromadb", "langgraph", "langchain_groq",
+         "pypdf", "langchain_text_splitters", "langchain_community.tools.tavily_search"]
+
+APP_IMPORTS = "streamlit, config, context, grading, metrics, search"
+
+WELCOME = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=300)
+at.secrets["GROQ_API_KEY"] = at.secrets["TAVILY_API_KEY"] = ""
+t0 = time.perf_counter()
+at.run()
+print(json.dumps({"ms": (time.perf_counter() - t0) * 1000, "errors": [str(e.value) for e in at.exception],
+                  "loaded": [m for m in sys.argv[1:] if m in sys.modules]}))
+"""
+
+
+def child(args, **env):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True,
+                          env={**os.environ, "RAG_PREWARM": "0", **env})
+
+
+# `python -X importtime` in a fresh interpreter: wall time to import the
+# modules and the packages that spent the most of it, by self time. Rows
+# before the marker are the interpreter's own start-up.
+def import_profile(modules, top):
+    code = (f"import sys, time; sys.stderr.write('-\\n'); t0 = time.perf_counter(); import {modules}; "
+            f"print((time.perf_counter() - t0) * 1000)")
+    run  = child(["-X", "importtime", "-c", code])
+    rows = run.stderr.split("-\n", 1)[1].splitlines()
+    packages = Counter()
+    for line in rows:
+        if line.startswith("import time:"):
+            self_us, _, name = line.split("|")
+            packages[name.strip().split(".")[0]] += int(self_us.split(":")[1])
+    return float(run.stdout), [(p, us / 1000) for p, us in packages.most_common(top)]
+
+
+# ── COLD START PROFILE ─────────────────────────────────────────────────────────
+# What a fresh Streamlit worker pays before the welcome screen, rendered with
+# AppTest and pre-warm off, and which heavy stacks it loaded to get there
+# (none, ideally), next to the import cost of the modules the first question
+# or upload needs. `--budget-ms` fails the run when the welcome screen is
+# slower, so cold start can be tracked like any other regression.
+def main():
+    ap = argparse.ArgumentParser(description="Profile cold start of the Streamlit app and the engine imports.")
+    ap.add_argument("--modules", default="app_imports,engine,server", help="app_imports: the app's own top imports")
+    ap.add_argument("--top", type=int, default=8, help="heaviest packages listed per module")
+    ap.add_argument("--budget-ms", type=float, help="fail if the welcome screen takes longer")
+    ap.add_argument("--json", help="write the report here")
+    args = ap.parse_args()
+
+    welcome = json.loads(child(["-c", WELCOME, *HEAVY]).stdout.splitlines()[-1])
+    print(f"welcome screen  {welcome['ms']:>8.0f} ms  heavy stacks loaded: {', '.join(welcome['loaded']) or 'none'}")
+    for error in welcome["errors"]:
+        print(f"  error  {error}")
+
+    report = {"welcome": welcome, "imports": {}}
+    for module in args.modules.split(","):
+        total, packages = import_profile(APP_IMPORTS if module == "app_imports" else module, args.top)
+        report["imports"][module] = {"ms": total, "packages": dict(packages)}
+        print(f"import {module:<9} {total:>8.0f} ms  " + " · ".join(f"{p} {ms:.0f}" for p, ms in packages))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.budget_ms and welcome["ms"] > args.budget_ms:
+        print(f"OVER BUDGET  welcome screen {welcome['ms']:.0f} ms > {args.budget_ms:.0f} ms")
+        sys.exit(1)
+    sys.exit(1 if welcome["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import FILLER, write_pdf
+
+
+def upload(pages, i, words):
+    with tempfile.TemporaryDirectory(prefix="rag-upload-") as work:
+        path = os.path.join(work, "upload.pdf")
+        write_pdf(path, [f"Upload {i} marker upload{i}x page {p + 1}. " + " ".join(FILLER[:words])
+                         for p in range(pages)])
+        with open(path, "rb") as f:
+            return f.read()
+
+
+# Parse-pool spills (rag_*) and this script's own fixtures (rag-upload-*).
+def temp_files():
+    return {path for pattern in ("rag_*", "rag-upload-*")
+            for path in glob.glob(os.path.join(tempfile.gettempdir(), pattern))}
+
+
+def wait(engine, key, corpus=False):
+    while engine._corpus_indexing([key]) if corpus else engine.is_indexing(key):
+        time.sleep(0.05)
+
+
+# Every chunk of an upload must carry its own marker and file name, whichever
+# session's upload finished first.
+def mismatches(rows, i):
+    return sum(f"upload{i}x" not in text or (meta or {}).get("source") != f"upload_{i}.pdf"
+               for text, meta in zip(rows["documents"], rows["metadatas"]))
+
+
+# ── CONCURRENT UPLOAD CHECK ────────────────────────────────────────────────────
+# Sessions uploading different PDFs at once, each parsed from its own bytes:
+# per-session indexes and the shared corpus must hold exactly the uploading
+# session's text, and no upload may leave a file behind in the temp dir.
+# Exits 1 on any mismatch; reports uploads/s.
+def main():
+    ap = argparse.ArgumentParser(description="Upload distinct PDFs concurrently and check each index's contents.")
+    ap.add_argument("--sessions", type=int, default=8)
+    ap.add_argument("--pages", type=int, default=40, help="pages per PDF (RAG_PARSE_MIN_PAGES and up use the pool)")
+    ap.add_argument("--words", type=int, default=20, help="filler words per page")
+    args = ap.parse_args()
+
+    work = tempfile.mkdtemp(prefix="rag-bench-uploads-")
+    os.environ["RAG_INDEX_DIR"]       = os.path.join(work, "index")
+    os.environ["RAG_CORPUS_DIR"]      = os.path.join(work, "corpus")
+    os.environ["RAG_EMBED_CACHE_DIR"] = os.path.join(work, "embed_cache")
+
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from embeddings import CachedEmbeddings
+    from engine import Engine
+    from fakes import FakeChatModel, FakeSearchTool
+
+    engine = Engine(llm=FakeChatModel(), search_tool=FakeSearchTool(),
+                    embeddings=CachedEmbeddings(DeterministicFakeEmbedding(size=384), "fake"))
+    before = temp_files()
+    files  = [upload(args.pages, i, args.words) for i in range(args.sessions)]
+
+    def session(i):
+        key = engine.ingest(files[i], f"upload_{i}.pdf")
+        wait(engine, key)
+        shared = engine.add_to_corpus(files[i], f"upload_{i}.pdf")
+        wait(engine, shared, corpus=True)
+        return key
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.sessions) as pool:
+        keys = list(pool.map(session, range(args.sessions)))
+    wall = time.perf_counter() - t0
+
+    failed = 0
+    for i, key in enumerate(keys):
+        status = engine.document_status(key)
+        own    = engine.vectorstore(key).vectorstore.get(include=["documents", "metadatas"])
+        shared = engine.corpus.index.vectorstore.get(where={"doc_key": key}, include=["documents", "metadatas"])
+        bad    = mismatches(own, i) + mismatches(shared, i)
+        failed += bad or status["state"] != "ready" or not own["ids"] or len(shared["ids"]) != len(own["ids"])
+        print(f"session {i}  {status['state']:<8} {len(own['ids']):>5} chunks  corpus {len(shared['ids']):>5}  "
+              f"foreign {bad}")
+    leftover = temp_files() - before
+    print(f"{args.sessions} concurrent uploads in {wall:.1f}s ({args.sessions / wall:.2f} uploads/s), "
+          f"{len(leftover)} temp files left")
+    sys.exit(1 if failed or leftover else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import hashlib
+import random
+import re
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+STOPWORDS = {"what", "which", "when", "where", "does", "with", "that", "this", "from", "about", "there"}
+
+
+def content_words(text):
+    return {w for w in re.findall(r"[a-z0-9]+", text.lower()) if len(w) > 3 and w not in STOPWORDS}
+
+
+# ── FAKE LLM ───────────────────────────────────────────────────────────────────
+# Deterministic stand-in for ChatGroq. Grading prompts are answered by word
+# overlap between question and context so fallback rates stay meaningful;
+# anything else gets a canned answer streamed at `tokens_per_s` after
+# `latency_s` to first token. `failure_rate` answers a seeded share of calls
+# with a 429, as Groq does when rate limited; `unsure_rate` answers a seeded
+# share of grading prompts with a hedge instead of yes or no, as small models
+# sometimes do.
+class FakeRateLimitError(RuntimeError):
+    status_code = 429
+
+
+class FakeChatModel(BaseChatModel):
+    model:        str   = "fake"
+    latency_s:    float = 0.05
+    tokens_per_s: float = 250.0
+    failure_rate: float = 0.0
+    unsure_rate:  float = 0.0
+    answer_words: int   = 60
+    seed:         int   = 0
+
+    def model_post_init(self, _):
+        self._rng  = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _reply(self, messages):
+        prompt = messages[-1].content
+        if prompt.startswith("Is this context relevant"):
+            question, context = prompt.split("\nQuestion: ", 1)[1].split("\nContext: ", 1)
+            wanted = content_words(question)
+            with self._lock:
+                unsure = self.unsure_rate and self._rng.random() < self.unsure_rate
+            if unsure:
+                return "It depends on what the question means by that."
+            return "yes" if wanted and len(wanted & content_words(context)) / len(wanted) >= 0.5 else "no"
+        question = prompt.rsplit("Question: ", 1)[-1]
+        words    = (f"Based on the sources, the answer to '{question}' is as follows.".split()
+                    + ["detail"] * self.answer_words)
+        return " ".join(words[:self.answer_words])
+
+    def _maybe_fail(self):
+        with self._lock:
+            failed = self._rng.random() < self.failure_rate
+        if failed:
+            raise FakeRateLimitError("injected 429 rate limit")
+
+    # Whitespace words stand in for tokens so token metrics are populated.
+    def _usage(self, messages, text):
+        prompt = len(messages[-1].content.split())
+        return {"input_tokens": prompt, "output_tokens": len(text.split()),
+                "total_tokens": prompt + len(text.split())}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self._maybe_fail()
+        text = self._reply(messages)
+        time.sleep(self.latency_s + len(text.split()) / self.tokens_per_s)
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self._maybe_fail()
+        time.sleep(self.latency_s)
+        text = self._reply(messages)
+        for word in text.split():
+            time.sleep(1 / self.tokens_per_s)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, text)))
+
+
+# ── FAKE EMBEDDINGS ────────────────────────────────────────────────────────────
+# Hashed bag of words, L2-normalised: texts sharing vocabulary land close
+# together, as with a sentence embedding, while tokens holding digits (part
+# numbers, values) are dropped, which is where real embeddings are weakest.
+# Unlike DeterministicFakeEmbedding, dense retrieval has a signal to fuse.
+class BagOfWordsEmbedding(Embeddings):
+    def __init__(self, size=384):
+        self.size = size
+
+    def _embed(self, text):
+        v = np.zeros(self.size, dtype=np.float32)
+        for word in re.findall(r"[a-z]+(?:[-_./]?[a-z0-9]+)*", text.lower()):
+            if not any(c.isdigit() for c in word):
+                v[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.size] += 1
+        return (v / (np.linalg.norm(v) or 1.0)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+# ── FAKE SEARCH ────────────────────────────────────────────────────────────────
+# Stand-in for TavilySearchResults with the same result shape.
+class FakeSearchTool:
+    def __init__(self, latency_s=0.3, failure_rate=0.0, results=3, seed=0):
+        self.latency_s    = latency_s
+        self.failure_rate = failure_rate
+        self.results      = results
+        self._rng         = random.Random(seed)
+        self._lock        = threading.Lock()
+
+    def invoke(self, payload):
+        with self._lock:
+            failed = self._rng.random() < self.failure_rate
+        time.sleep(self.latency_s)
+        if failed:
+            raise RuntimeError("injected search failure")
+        query = payload["query"]
+        return [
+            {"url": f"https://example.com/{i}", "content": f"Web result {i} for {query}. " * 20}
+            for i in range(self.results)
+        ]
@@ -0,0 +1,69 @@
+import json
+import os
+import random
+
+SUBJECTS = ["cryostat", "spectrometer", "actuator", "transceiver", "reactor", "turbine",
+            "gyroscope", "capacitor", "manifold", "servo", "laser", "condenser"]
+FILLER   = ("The assembly was reviewed during the quarterly audit and the findings were "
+            "recorded in the maintenance log for later reference by the operations team.").split()
+
+
+# ── MINIMAL PDF WRITER ─────────────────────────────────────────────────────────
+# Just enough PDF for pypdf to extract text: one Helvetica font, one content
+# stream per page. Keeps binary fixtures out of the repository.
+def write_pdf(path, pages):
+    body, offsets = [b"%PDF-1.4\n"], []
+
+    def add(obj):
+        offsets.append(sum(len(b) for b in body))
+        body.append(f"{len(offsets)} 0 obj\n".encode() + obj + b"\nendobj\n")
+
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages)))
+    add(b"<< /Type /Catalog /Pages 2 0 R >>")
+    add(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, text in enumerate(pages):
+        words = text.replace("(", "").replace(")", "").split()
+        lines = [" ".join(words[j:j + 14]) for j in range(0, len(words), 14)]
+        ops   = "BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        add(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        add(f"<< /Length {len(ops)} >>\nstream\n{ops}\nendstream".encode())
+    xref = sum(len(b) for b in body)
+    body.append(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+    body += [f"{o:010d} 00000 n \n".encode() for o in offsets]
+    body.append(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    with open(path, "wb") as f:
+        f.write(b"".join(body))
+
+
+# ── SYNTHETIC CORPUS ───────────────────────────────────────────────────────────
+# Each document states one numeric fact per subject, buried in filler; the
+# question set asks for half of them plus some the corpus cannot answer, so
+# both the PDF path and the web fallback get exercised.
+def synthetic_corpus(out_dir, docs=3, pages=40, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    questions = []
+    for d in range(docs):
+        name  = f"report_{d}.pdf"
+        facts = {s: rng.randint(10, 990) for s in rng.sample(SUBJECTS, 6)}
+        text  = []
+        for p in range(pages):
+            sentences = [" ".join(rng.choices(FILLER, k=len(FILLER))) + "." for _ in range(12)]
+            subject   = list(facts)[p % len(facts)]
+            sentences.insert(rng.randrange(12), f"The {subject} unit {d} operates at {facts[subject]} kelvin.")
+            text.append(f"Report {d} page {p + 1}. " + " ".join(sentences))
+        write_pdf(os.path.join(out_dir, name), text)
+        questions += [{"doc": name, "question": f"At what temperature does the {s} unit {d} operate?"}
+                      for s in list(facts)[:3]]
+        questions += [{"doc": name, "question": f"Who manufactured the {s} used in report {d}?"}
+                      for s in rng.sample(SUBJECTS, 2)]
+    with open(os.path.join(out_dir, "questions.jsonl"), "w") as f:
+        f.write("".join(json.dumps(q) + "\n" for q in questions))
+    return out_dir
+
+
+def load_questions(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import load_questions, synthetic_corpus
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Offline CRAG benchmark with local stand-ins for Groq and Tavily.")
+    ap.add_argument("--corpus", help="directory of PDFs with a questions.jsonl (default: synthetic corpus)")
+    ap.add_argument("--questions", help="JSONL of {\"doc\": file, \"question\": text}; default <corpus>/questions.jsonl")
+    ap.add_argument("--docs", type=int, default=3, help="synthetic corpus: number of PDFs")
+    ap.add_argument("--pages", type=int, default=40, help="synthetic corpus: pages per PDF")
+    ap.add_argument("--embeddings", choices=["fake", "hf"], default="fake",
+                    help="deterministic hash embeddings, or the configured HuggingFace model")
+    ap.add_argument("--llm-latency", type=float, default=0.05, help="seconds to first token")
+    ap.add_argument("--llm-tokens-per-s", type=float, default=250.0)
+    ap.add_argument("--llm-failure-rate", type=float, default=0.0, help="share of LLM calls answered with a 429")
+    ap.add_argument("--llm-rps", type=float, default=0.0, help="LLM client rate limit (0: unlimited)")
+    ap.add_argument("--grade-llm-latency", type=float,
+                    help="route grading to a small fake model with this latency (default: grade with the main one)")
+    ap.add_argument("--grade-llm-tokens-per-s", type=float, default=750.0)
+    ap.add_argument("--grade-llm-unsure-rate", type=float, default=0.05,
+                    help="share of grading replies the small model hedges on, escalated to the main one")
+    ap.add_argument("--search-latency", type=float, default=0.3)
+    ap.add_argument("--search-failure-rate", type=float, default=0.0)
+    ap.add_argument("--speculative", action="store_true", help="run the graph in speculative search mode")
+    ap.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrent query levels")
+    ap.add_argument("--json", help="write the report here")
+    ap.add_argument("--baseline", help="previous --json report to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    return ap.parse_args()
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] if values else 0.0
+
+
+# ── INGESTION ──────────────────────────────────────────────────────────────────
+def bench_ingest(engine, corpus):
+    from config import CHUNK_SIZE, CHUNK_OVERLAP, EMBED_MODEL
+    from index_store import index_key
+    from ingest import IngestJob, iter_pages, parse_pool
+
+    keys, totals, t0 = {}, defaultdict(float), time.perf_counter()
+    for name in sorted(f for f in os.listdir(corpus) if f.endswith(".pdf")):
+        pdf = os.path.join(corpus, name)
+        with open(pdf, "rb") as f:
+            key = index_key(f.read(), CHUNK_SIZE, CHUNK_OVERLAP, EMBED_MODEL)
+        index = engine.store.create(key, engine.embeddings)
+        job   = IngestJob(iter_pages(pdf, parse_pool()), index).run()
+        if job.error:
+            raise job.error
+        engine.store.commit(key, index, name)
+        keys[name] = key
+        totals["pages"]    += job.counts["pages"]
+        totals["chunks"]   += job.counts["embedded"]
+        totals["embed_s"]  += job.seconds["embed"]
+    wall = time.perf_counter() - t0
+    return keys, {
+        "files":            len(keys),
+        "pages":            int(totals["pages"]),
+        "chunks":           int(totals["chunks"]),
+        "seconds":          wall,
+        "pages_per_s":      totals["pages"] / wall,
+        "embeddings_per_s": totals["chunks"] / max(totals["embed_s"], 1e-9),
+    }
+
+
+# ── QUERIES ────────────────────────────────────────────────────────────────────
+# The graph is sequential, so each node's latency is the gap since the
+# previous node finished.
+def run_question(engine, question, key):
+    t0 = last = time.perf_counter()
+    nodes, ttft, tokens, models = {}, None, 0, {}
+    try:
+        for event in engine.stream(question, key):
+            now = time.perf_counter()
+            if event["type"] == "node":
+                nodes[event["node"]] = now - last
+                last = now
+            elif event["type"] == "token" and ttft is None:
+                ttft = now - t0
+            elif event["type"] == "done":
+                tokens = sum(t["input"] + t["output"] for t in event["trace"]["tokens"].values())
+                models = event["trace"]["models"]
+    except Exception as e:
+        return {"error": repr(e)}
+    return {"nodes": nodes, "total": time.perf_counter() - t0, "ttft": ttft or 0.0, "tokens": tokens,
+            "models": models}
+
+
+def bench_queries(engine, questions, keys, levels):
+    # Every question must reach the graph; the answer cache would hide it.
+    engine.answers.threshold = float("inf")
+    runs = [run_question(engine, q["question"], keys.get(q.get("doc"))) for q in questions]
+    ok   = [r for r in runs if "error" not in r]
+    per_node  = defaultdict(list)
+    per_model = defaultdict(lambda: defaultdict(float))
+    for r in ok:
+        for node, s in r["nodes"].items():
+            per_node[node].append(s)
+        for model, t in r["models"].items():
+            for k, v in t.items():
+                per_model[model][k] += v
+
+    throughput = {}
+    for n in levels:
+        batch = questions * max(1, (2 * n) // len(questions))
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(n) as pool:
+            list(pool.map(lambda q: run_question(engine, q["question"], keys.get(q.get("doc"))), batch))
+        throughput[str(n)] = len(batch) / (time.perf_counter() - t0)
+
+    return {
+        "nodes": {node: {"n": len(v), "p50_ms": pct(v, 50) * 1000, "p95_ms": pct(v, 95) * 1000}
+                  for node, v in per_node.items()},
+        # Per model, so runs with and without --grade-llm-latency show what
+        # routing grading to a small model saves.
+        "models": {model: {"calls_per_q":  t["calls"] / len(ok),
+                           "tokens_per_q": (t["input"] + t["output"]) / len(ok),
+                           "mean_call_ms": t["ms"] / max(t["calls"], 1)}
+                   for model, t in per_model.items()},
+        "e2e": {
+            "questions":         len(runs),
+            "failures":          len(runs) - len(ok),
+            "p50_ms":            pct([r["total"] for r in ok], 50) * 1000,
+            "p95_ms":            pct([r["total"] for r in ok], 95) * 1000,
+            "ttft_p50_ms":       pct([r["ttft"] for r in ok], 50) * 1000,
+            "llm_tokens_per_q":  sum(r["tokens"] for r in ok) / max(len(ok), 1),
+            "web_fallback_rate": sum("web_search" in r["nodes"] for r in ok) / max(len(ok), 1),
+        },
+        "throughput_qps": throughput,
+    }
+
+
+# ── REPORT ─────────────────────────────────────────────────────────────────────
+def flatten(report, prefix=""):
+    out = {}
+    for k, v in report.items():
+        if isinstance(v, dict):
+            out.update(flatten(v, f"{prefix}{k}."))
+        elif isinstance(v, (int, float)):
+            out[f"{prefix}{k}"] = v
+    return out
+
+
+def regressions(report, baseline, tolerance):
+    found, current = [], flatten(report)
+    for name, old in flatten(baseline).items():
+        new = current.get(name)
+        if new is None or not old:
+            continue
+        if ("per_s" in name or "throughput" in name) and new < old * (1 - tolerance):
+            found.append(f"{name}: {old:.2f} → {new:.2f}")
+        elif (name.endswith("p95_ms") or name == "peak_rss_mb") and new > old * (1 + tolerance):
+            found.append(f"{name}: {old:.2f} → {new:.2f}")
+    return found
+
+
+def print_report(report):
+    ing = report["ingest"]
+    print(f"ingest      {ing['files']} files · {ing['pages']} pages · {ing['chunks']} chunks · "
+          f"{ing['pages_per_s']:.1f} pages/s · {ing['embeddings_per_s']:.1f} embeddings/s")
+    for node, s in report["queries"]["nodes"].items():
+        print(f"{node:<11} p50 {s['p50_ms']:8.1f} ms · p95 {s['p95_ms']:8.1f} ms · n={s['n']}")
+    e2e = report["queries"]["e2e"]
+    print(f"end-to-end  p50 {e2e['p50_ms']:8.1f} ms · p95 {e2e['p95_ms']:8.1f} ms · "
+          f"ttft p50 {e2e['ttft_p50_ms']:.1f} ms · {e2e['llm_tokens_per_q']:.0f} LLM tokens/q · web fallback {e2e['web_fallback_rate']:.0%} · "
+          f"{e2e['failures']}/{e2e['questions']} failed")
+    for model, s in report["queries"]["models"].items():
+        print(f"model {model:<10} {s['calls_per_q']:.1f} calls/q · {s['tokens_per_q']:.0f} tokens/q · "
+              f"{s['mean_call_ms']:.1f} ms/call")
+    for n, qps in report["queries"]["throughput_qps"].items():
+        print(f"concurrency {n:>3} → {qps:.2f} questions/s")
+    llm = report["llm_client"]
+    print(f"llm client  {llm.get('calls', 0)} upstream calls · {llm.get('coalesced', 0)} coalesced · "
+          f"{llm.get('retries', 0)} retries · {llm.get('failures', 0)} failed")
+    routing = report["grade_routing"]
+    print(f"grading     {routing.get('small', 0)} to the small model · {routing.get('escalated', 0)} escalated · "
+          f"{routing.get('large', 0)} to the main model")
+    print(f"peak RSS    {report['peak_rss_mb']:.0f} MB")
+
+
+def main():
+    args = parse_args()
+    work = tempfile.mkdtemp(prefix="rag-bench-")
+    # Stores must be isolated before config is first imported.
+    os.environ["RAG_INDEX_DIR"]          = os.path.join(work, "index")
+    os.environ["RAG_EMBED_CACHE_DIR"]    = os.path.join(work, "embed_cache")
+    os.environ["RAG_LLM_REQUESTS_PER_S"] = str(args.llm_rps)
+
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from config import EMBED_MODEL
+    from embeddings import CachedEmbeddings
+    from engine import Engine, load_embeddings
+    from fakes import FakeChatModel, FakeSearchTool
+
+    corpus    = args.corpus or synthetic_corpus(os.path.join(work, "corpus"), args.docs, args.pages)
+    questions = load_questions(args.questions or os.path.join(corpus, "questions.jsonl"))
+    engine    = Engine(
+        llm=FakeChatModel(model="fake-large", latency_s=args.llm_latency, tokens_per_s=args.llm_tokens_per_s,
+                          failure_rate=args.llm_failure_rate),
+        grade_llm=(FakeChatModel(model="fake-small", latency_s=args.grade_llm_latency,
+                                 tokens_per_s=args.grade_llm_tokens_per_s, failure_rate=args.llm_failure_rate,
+                                 unsure_rate=args.grade_llm_unsure_rate)
+                   if args.grade_llm_latency is not None else None),
+        search_tool=FakeSearchTool(latency_s=args.search_latency, failure_rate=args.search_failure_rate),
+        embeddings=(CachedEmbeddings(DeterministicFakeEmbedding(size=384), "fake")
+                    if args.embeddings == "fake" else load_embeddings(EMBED_MODEL)),
+        speculative=args.speculative,
+    )
+
+    keys, ingest = bench_ingest(engine, corpus)
+    report = {
+        "ingest":        ingest,
+        "queries":       bench_queries(engine, questions, keys, [int(n) for n in args.concurrency.split(",")]),
+        "llm_client":    engine.llm.summary(),
+        "grade_routing": engine.grader.summary(),
+        "peak_rss_mb":   resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION  {line}")
+        sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
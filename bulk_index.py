@@ -0,0 +1,178 @@
+import argparse
+import os
+import signal
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from multiprocessing import get_context
+
+from config import CHUNK_SIZE, CHUNK_OVERLAP, EMBED_MODEL, INGEST_BATCH_SIZE
+from embeddings import CachedEmbeddings, base_embeddings, embedding_id
+from index_store import IndexStore, index_key
+
+EMBED_ID = embedding_id(EMBED_MODEL)
+
+
+@lru_cache(maxsize=None)
+def load_embeddings():
+    return CachedEmbeddings(base_embeddings(EMBED_MODEL), EMBED_ID)
+
+
+# ── WORKER ─────────────────────────────────────────────────────────────────────
+# Ctrl-C reaches the whole process group; only the parent handles it, letting
+# workers finish the documents they hold.
+def init_worker():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+# Parses, chunks and embeds one PDF exactly as an upload would. Vectors go to
+# the shared on-disk embedding cache, so only the chunks travel back and the
+# parent's writes are cache hits.
+def prepare(path, name):
+    from ingest import batched, iter_chunks, iter_pages
+
+    with open(path, "rb") as f:
+        data = f.read()
+    counts = Counter()
+
+    def counted(pages):
+        for page in pages:
+            counts["pages"] += 1
+            yield page
+
+    chunks = list(iter_chunks(counted(iter_pages(data, name=name))))
+    for batch in batched(chunks, INGEST_BATCH_SIZE):
+        load_embeddings().embed_documents([c.page_content for c in batch])
+    return chunks, counts["pages"]
+
+
+# ── TARGETS ────────────────────────────────────────────────────────────────────
+# Per-document indexes in the index store (what uploads attach to), or the
+# shared corpus. A document already committed is skipped, so an interrupted
+# run resumes where it stopped.
+class StoreTarget:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.store      = IndexStore()
+
+    def has(self, key):
+        return self.store.has(key)
+
+    def write(self, key, name, chunks):
+        self.store.build(key, chunks, self.embeddings, name).close()
+
+    def close(self):
+        pass
+
+
+class CorpusTarget:
+    def __init__(self, embeddings):
+        from corpus import Corpus
+
+        self.corpus = Corpus(embeddings)
+
+    def has(self, key):
+        return self.corpus.has(key)
+
+    # The lexical index is saved once at the end; after a crash the corpus
+    # rebuilds it from the collection on open.
+    def write(self, key, name, chunks):
+        from ingest import batched
+
+        for batch in batched(self.corpus.tag(key, name, chunks), INGEST_BATCH_SIZE):
+            self.corpus.index.add_documents(batch)
+        self.corpus.commit(key, name, len(chunks), save=False)
+
+    def close(self):
+        self.corpus.save()
+
+
+def find_pdfs(root):
+    return sorted(os.path.join(d, f) for d, _, files in os.walk(root) for f in files if f.lower().endswith(".pdf"))
+
+
+# ── BULK INDEXING ──────────────────────────────────────────────────────────────
+# Indexes a directory of PDFs ahead of time with the app's chunking and
+# embedding settings. Workers parse and embed in parallel; this process is the
+# only writer. Embedding threads are split between workers unless
+# RAG_EMBED_THREADS is set.
+def main():
+    ap = argparse.ArgumentParser(description="Index a directory of PDFs into the store the app reads from.")
+    ap.add_argument("directory")
+    ap.add_argument("--corpus", action="store_true", help="add to the shared corpus instead of per-document indexes")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    t0      = time.perf_counter()
+    targets = {}
+    for path in find_pdfs(args.directory):
+        with open(path, "rb") as f:
+            key = index_key(f.read(), CHUNK_SIZE, CHUNK_OVERLAP, EMBED_ID)
+        targets.setdefault(key, path)
+    embeddings = load_embeddings()
+    target     = CorpusTarget(embeddings) if args.corpus else StoreTarget(embeddings)
+    todo       = [(key, path) for key, path in targets.items() if not target.has(key)]
+    totals     = Counter(skipped=len(targets) - len(todo))
+    if not args.corpus and len(targets) > target.store.max_entries:
+        print(f"warning: {len(targets)} documents but the store keeps {target.store.max_entries}; "
+              f"raise RAG_INDEX_MAX_ENTRIES (and RAG_INDEX_MAX_MB) to keep them all")
+    print(f"{len(targets)} documents · {totals['skipped']} already indexed · {len(todo)} to index "
+          f"with {args.workers} workers")
+
+    os.environ.setdefault("RAG_EMBED_THREADS", str(max(1, (os.cpu_count() or 1) // args.workers)))
+    pool    = ProcessPoolExecutor(args.workers, mp_context=get_context("spawn"), initializer=init_worker)
+    queue   = iter(todo)
+    pending = {}
+
+    def collect(future):
+        key, path = pending.pop(future)
+        try:
+            chunks, pages = future.result()
+            target.write(key, os.path.basename(path), chunks)
+        except Exception as e:
+            totals["failed"] += 1
+            print(f"failed  {path}: {e}")
+            return
+        totals.update(files=1, pages=pages, chunks=len(chunks))
+        print(f"indexed {path}  {pages} pages · {len(chunks)} chunks")
+
+    try:
+        while True:
+            # A bounded window keeps finished chunks from piling up ahead of
+            # the single writer.
+            while len(pending) < 2 * args.workers and (item := next(queue, None)):
+                key, path = item
+                pending[pool.submit(prepare, path, os.path.basename(path))] = item
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                collect(future)
+    except KeyboardInterrupt:
+        # Queued documents are dropped and documents already finished or in a
+        # worker are written. A worker still starting up dies with the signal;
+        # its documents, like the queued ones, are redone on resume.
+        totals["interrupted"] = 1
+        print("interrupted: finishing the documents workers hold, then saving; run again to resume")
+        pool.shutdown(cancel_futures=True)
+        for future in list(pending):
+            if not future.cancelled() and not isinstance(future.exception(), BrokenProcessPool):
+                collect(future)
+    finally:
+        pool.shutdown(cancel_futures=True)
+        target.close()
+
+    seconds = time.perf_counter() - t0
+    print(f"{totals['files']} files · {totals['skipped']} skipped · {totals['failed']} failed · "
+          f"{totals['pages']} pages · {totals['chunks']} chunks · {seconds:.1f} s")
+    print(f"{totals['files'] / seconds:.2f} files/s · {totals['pages'] / seconds:.1f} pages/s · "
+          f"{totals['chunks'] / seconds:.1f} chunks/s · {embeddings.stats['computed']} chunks embedded "
+          f"here rather than by workers")
+    sys.exit(130 if totals["interrupted"] else 1 if totals["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
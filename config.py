@@ -0,0 +1,95 @@
+import os
+
+# ── MODELS ─────────────────────────────────────────────────────────────────────
+LLM_MODEL       = os.environ.get("RAG_LLM_MODEL", "llama-3.3-70b-versatile")
+LLM_TEMPERATURE = float(os.environ.get("RAG_LLM_TEMPERATURE", "0"))
+GRADE_MODEL     = os.environ.get("RAG_GRADE_MODEL", "llama-3.1-8b-instant")
+EMBED_MODEL     = os.environ.get("RAG_EMBED_MODEL", "all-MiniLM-L6-v2")
+EMBED_CACHE_DIR = os.environ.get("RAG_EMBED_CACHE_DIR", ".rag_embed_cache")
+
+# ── EMBEDDING BACKEND ──────────────────────────────────────────────────────────
+EMBED_BACKEND    = os.environ.get("RAG_EMBED_BACKEND", "torch")
+EMBED_QUANTIZE   = os.environ.get("RAG_EMBED_QUANTIZE", "")
+EMBED_THREADS    = int(os.environ.get("RAG_EMBED_THREADS", "0"))
+EMBED_BATCH_SIZE = int(os.environ.get("RAG_EMBED_BATCH_SIZE", "32"))
+EMBED_ONNX_DIR   = os.environ.get("RAG_EMBED_ONNX_DIR", ".rag_onnx")
+
+# ── LLM CLIENT ─────────────────────────────────────────────────────────────────
+# Groq calls per second per model and key, 0 for no pacing; the bucket starts
+# full with RAG_LLM_BURST tokens, so a burst that size never waits.
+LLM_REQUESTS_PER_S  = float(os.environ.get("RAG_LLM_REQUESTS_PER_S", "10"))
+LLM_BURST           = int(os.environ.get("RAG_LLM_BURST", "10"))
+LLM_MAX_RETRIES     = int(os.environ.get("RAG_LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_S       = float(os.environ.get("RAG_LLM_BACKOFF_S", "0.5"))
+LLM_BACKOFF_MAX_S   = float(os.environ.get("RAG_LLM_BACKOFF_MAX_S", "20"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("RAG_LLM_MAX_CONNECTIONS", "32"))
+
+# ── CHUNKING ───────────────────────────────────────────────────────────────────
+CHUNK_SIZE    = int(os.environ.get("RAG_CHUNK_SIZE", "800"))
+CHUNK_OVERLAP = int(os.environ.get("RAG_CHUNK_OVERLAP", "100"))
+
+# ── INGESTION ──────────────────────────────────────────────────────────────────
+INGEST_BATCH_SIZE    = int(os.environ.get("RAG_INGEST_BATCH_SIZE", "64"))
+PARSE_WORKERS        = int(os.environ.get("RAG_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+PARSE_MIN_PAGES      = int(os.environ.get("RAG_PARSE_MIN_PAGES", "32"))
+PARSE_PAGES_PER_TASK = int(os.environ.get("RAG_PARSE_PAGES_PER_TASK", "8"))
+
+# ── INDEX STORE ────────────────────────────────────────────────────────────────
+INDEX_DIR         = os.environ.get("RAG_INDEX_DIR", ".rag_index")
+INDEX_MAX_MB      = int(os.environ.get("RAG_INDEX_MAX_MB", "2048"))
+INDEX_MAX_ENTRIES = int(os.environ.get("RAG_INDEX_MAX_ENTRIES", "200"))
+INDEX_RESIDENT_MB = int(os.environ.get("RAG_INDEX_RESIDENT_MB", "512"))
+
+# ── SHARED CORPUS ──────────────────────────────────────────────────────────────
+CORPUS_DIR                  = os.environ.get("RAG_CORPUS_DIR", ".rag_corpus")
+CORPUS_HNSW_M               = int(os.environ.get("RAG_CORPUS_HNSW_M", "16"))
+CORPUS_HNSW_CONSTRUCTION_EF = int(os.environ.get("RAG_CORPUS_HNSW_CONSTRUCTION_EF", "200"))
+CORPUS_HNSW_SEARCH_EF       = int(os.environ.get("RAG_CORPUS_HNSW_SEARCH_EF", "64"))
+
+# ── RETRIEVAL ──────────────────────────────────────────────────────────────────
+# A fetch_k of 0 takes 2·k candidates from each retriever.
+RETRIEVE_K       = int(os.environ.get("RAG_RETRIEVE_K", "4"))
+RETRIEVE_FETCH_K = int(os.environ.get("RAG_RETRIEVE_FETCH_K", "0"))
+RRF_K            = int(os.environ.get("RAG_RRF_K", "60"))
+DENSE_WEIGHT     = float(os.environ.get("RAG_DENSE_WEIGHT", "1.0"))
+LEXICAL_WEIGHT   = float(os.environ.get("RAG_LEXICAL_WEIGHT", "1.0"))
+BM25_K1          = float(os.environ.get("RAG_BM25_K1", "1.2"))
+BM25_B           = float(os.environ.get("RAG_BM25_B", "0.75"))
+
+# ── VECTOR STORAGE ─────────────────────────────────────────────────────────────
+VECTOR_STORAGE   = os.environ.get("RAG_VECTOR_STORAGE", "float")
+QUANTIZED_RERANK = int(os.environ.get("RAG_QUANTIZED_RERANK", "64"))
+
+# ── CONTEXT ────────────────────────────────────────────────────────────────────
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("RAG_CONTEXT_TOKEN_BUDGET", "1500"))
+WEB_SNIPPET_CHARS    = int(os.environ.get("RAG_WEB_SNIPPET_CHARS", "700"))
+
+# ── GRADING ────────────────────────────────────────────────────────────────────
+GRADE_CONCURRENCY   = int(os.environ.get("RAG_GRADE_CONCURRENCY", "8"))
+GRADE_MIN_RELEVANT  = int(os.environ.get("RAG_GRADE_MIN_RELEVANT", "1"))
+PREGRADE_HIGH       = float(os.environ.get("RAG_PREGRADE_HIGH", "0.6"))
+PREGRADE_LOW        = float(os.environ.get("RAG_PREGRADE_LOW", "0.2"))
+CROSS_ENCODER_MODEL = os.environ.get("RAG_CROSS_ENCODER_MODEL", "")
+CROSS_ENCODER_HIGH  = float(os.environ.get("RAG_CROSS_ENCODER_HIGH", "0.9"))
+CROSS_ENCODER_LOW   = float(os.environ.get("RAG_CROSS_ENCODER_LOW", "0.1"))
+
+# ── WEB SEARCH ─────────────────────────────────────────────────────────────────
+SPECULATIVE_SEARCH = os.environ.get("RAG_SPECULATIVE_SEARCH", "0") == "1"
+SEARCH_CACHE_SIZE  = int(os.environ.get("RAG_SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL_S = float(os.environ.get("RAG_SEARCH_CACHE_TTL_S", "3600"))
+
+# ── ANSWER CACHE ───────────────────────────────────────────────────────────────
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("RAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_SIZE      = int(os.environ.get("RAG_ANSWER_CACHE_SIZE", "2048"))
+ANSWER_CACHE_TTL_S     = float(os.environ.get("RAG_ANSWER_CACHE_TTL_S", "86400"))
+
+# ── BATCH QUESTIONS ────────────────────────────────────────────────────────────
+BATCH_WORKERS       = int(os.environ.get("RAG_BATCH_WORKERS", "8"))
+BATCH_MAX_QUESTIONS = int(os.environ.get("RAG_BATCH_MAX_QUESTIONS", "500"))
+
+# ── STARTUP ────────────────────────────────────────────────────────────────────
+PREWARM = os.environ.get("RAG_PREWARM", "1") == "1"
+
+# ── METRICS ────────────────────────────────────────────────────────────────────
+TRACE_FILE   = os.environ.get("RAG_TRACE_FILE", "")
+METRICS_PORT = int(os.environ.get("RAG_METRICS_PORT", "0"))
@@ -0,0 +1,62 @@
+from config import CHUNK_OVERLAP, CONTEXT_TOKEN_BUDGET, WEB_SNIPPET_CHARS
+from metrics import Stats
+
+CONTEXT_STATS = Stats()
+MIN_OVERLAP   = 20
+
+
+# Rough Llama-family BPE ratio for English prose; good enough to budget with.
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+# Length of the longest suffix of `a` that is also a prefix of `b`, which is
+# exactly what the splitter's chunk_overlap repeats between neighbours.
+def _overlap(a, b, max_chars=CHUNK_OVERLAP):
+    for n in range(min(len(a), len(b), max_chars), MIN_OVERLAP - 1, -1):
+        if a.endswith(b[:n]):
+            return n
+    return 0
+
+
+def _trim(text, max_chars):
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + " …"
+
+
+# ── CONTEXT PACKING ────────────────────────────────────────────────────────────
+# PDF chunks go first, most relevant first, with exact duplicates dropped and
+# text shared with an already-packed neighbour cut off. Web results follow in
+# Tavily's rank order, trimmed to a snippet. Sources that no longer fit the
+# token budget are left out.
+def pack_context(chunks, scores, web_results, budget=CONTEXT_TOKEN_BUDGET, web_chars=WEB_SNIPPET_CHARS):
+    ranked  = sorted(zip(chunks, scores), key=lambda p: -p[1]) if scores else [(c, 0) for c in chunks]
+    packed  = []
+    seen    = set()
+    for text, _ in ranked:
+        key = " ".join(text.split())
+        if key in seen:
+            continue
+        seen.add(key)
+        for prev in packed:
+            text = text[_overlap(prev[1], text):]
+            text = text[:len(text) - _overlap(text, prev[1])]
+        if text.strip():
+            packed.append(("PDF", text.strip()))
+    packed += [(f"Web · {r['url']}", _trim(r["content"], web_chars)) for r in web_results]
+
+    lines, used = [], 0
+    for label, text in packed:
+        entry = f"[{len(lines) + 1}] {label}\n{text}"
+        if used + estimate_tokens(entry) > budget:
+            continue
+        lines.append(entry)
+        used += estimate_tokens(entry)
+    return "\n\n".join(lines)
+
+
+def record_prompt_tokens(raw_prompt, packed_prompt):
+    raw, packed = estimate_tokens(raw_prompt), estimate_tokens(packed_prompt)
+    CONTEXT_STATS.add(raw_tokens=raw, packed_tokens=packed)
+    return {"raw": raw, "packed": packed}
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+
+from config import (CORPUS_DIR, CORPUS_HNSW_M, CORPUS_HNSW_CONSTRUCTION_EF, CORPUS_HNSW_SEARCH_EF,
+                    VECTOR_STORAGE)
+from hybrid import HybridIndex, LexicalIndex
+from quantized import QuantizedVectors
+
+
+# ── SHARED CORPUS ──────────────────────────────────────────────────────────────
+# Every corpus document lives in one persistent Chroma collection (plus its
+# lexical index), each chunk tagged with the document's index key, filename and
+# page, so questions can be filtered to any subset. The sqlite manifest lists
+# committed documents; chunks of a build that never committed are swept on
+# open, and a lexical index that lags the collection (bulk loads save it once
+# at the end) is rebuilt. One process writes the corpus; M and construction ef
+# are fixed when the collection is created, search ef is applied on every open.
+# `storage` only matters for a new, empty corpus: "int8" keeps quantized
+# vectors beside the collection instead of float vectors inside it.
+class Corpus:
+    def __init__(self, embeddings, root=CORPUS_DIR, m=CORPUS_HNSW_M,
+                 construction_ef=CORPUS_HNSW_CONSTRUCTION_EF, search_ef=CORPUS_HNSW_SEARCH_EF,
+                 storage=VECTOR_STORAGE):
+        root = os.path.abspath(root)
+        os.makedirs(root, exist_ok=True)
+        self.root    = root
+        self.version = 0
+        self._lock   = threading.Lock()
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS documents (key TEXT PRIMARY KEY, name TEXT, chunks INTEGER, added REAL)"
+        )
+        vectorstore = Chroma(
+            collection_name="corpus",
+            embedding_function=embeddings,
+            persist_directory=root,
+            collection_metadata={"hnsw:space": "cosine", "hnsw:M": m,
+                                 "hnsw:construction_ef": construction_ef, "hnsw:search_ef": search_ef},
+        )
+        vectorstore._collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+        count   = vectorstore._collection.count()
+        lexical = LexicalIndex.load(root)
+        if lexical is None or len(lexical) != count:
+            lexical = LexicalIndex.from_vectorstore(vectorstore)
+        vectors = QuantizedVectors.load(root)
+        if vectors is None and storage == "int8" and not count:
+            vectors = QuantizedVectors(root)
+        elif vectors is not None and len(vectors) != count:
+            vectors = QuantizedVectors.from_vectorstore(vectorstore, root)
+        self.index = HybridIndex(vectorstore, lexical, root, vectors)
+        self._sweep()
+
+    def _execute(self, sql, args=()):
+        with closing(sqlite3.connect(os.path.join(self.root, "corpus.sqlite"), timeout=30)) as db:
+            with db:
+                return db.execute(sql, args).fetchall()
+
+    # Only documents that still have rows; removed ones stay listed in the
+    # lexical index's key table.
+    def _sweep(self):
+        committed = {key for key, in self._execute("SELECT key FROM documents")}
+        for key in self.index.lexical.live_doc_keys() - committed:
+            self.remove(key)
+
+    # ── DOCUMENTS ──────────────────────────────────────────────────────────────
+    def documents(self):
+        rows = self._execute("SELECT key, name, chunks, added FROM documents ORDER BY name")
+        return [{"key": k, "name": n, "chunks": c, "added": a} for k, n, c, a in rows]
+
+    def has(self, key):
+        return bool(self._execute("SELECT 1 FROM documents WHERE key = ?", (key,)))
+
+    def tag(self, key, name, pages):
+        for page in pages:
+            yield Document(page_content=page.page_content,
+                           metadata={**page.metadata, "doc_key": key, "source": name})
+
+    def commit(self, key, name, chunks, save=True):
+        with self._lock:
+            if save:
+                self.index.save()
+            self._execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)", (key, name, chunks, time.time()))
+            self.version += 1
+
+    def save(self):
+        with self._lock:
+            self.index.save()
+
+    def remove(self, key):
+        with self._lock:
+            self.index.vectorstore._collection.delete(where={"doc_key": key})
+            self.index.lexical.drop(key)
+            if self.index.vectors is not None:
+                self.index.vectors.drop(key)
+            self.index.save()
+            self._execute("DELETE FROM documents WHERE key = ?", (key,))
+            self.version += 1
+
+    def summary(self):
+        count, chunks = self._execute("SELECT COUNT(*), COALESCE(SUM(chunks), 0) FROM documents")[0]
+        return {"documents": count, "chunks": chunks}
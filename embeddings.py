@@ -0,0 +1,186 @@
+import fcntl
+import hashlib
+import os
+import shutil
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import EMBED_CACHE_DIR, EMBED_BACKEND, EMBED_QUANTIZE, EMBED_THREADS, EMBED_BATCH_SIZE, EMBED_ONNX_DIR
+from metrics import timed_call
+
+
+# ── EMBEDDING BACKENDS ─────────────────────────────────────────────────────────
+# "torch" runs the sentence-transformers model as is; "onnx" runs the same
+# model through ONNX Runtime, optionally with int8 dynamic quantization
+# ("avx2", "avx512", "avx512_vnni" or "arm64", matching the CPU). Quantized
+# vectors differ slightly, so they get their own identity for the embedding
+# cache and index keys; float ONNX and torch vectors are interchangeable.
+def embedding_id(model_name, backend=EMBED_BACKEND, quantize=EMBED_QUANTIZE):
+    return f"{model_name}:{_onnx_file(quantize)[:-5]}" if backend == "onnx" and quantize else model_name
+
+
+def _onnx_file(quantize):
+    if not quantize:
+        return "model.onnx"
+    return f"model_{'quint8' if quantize == 'avx2' else 'qint8'}_{quantize}.onnx"
+
+
+# The export (and quantization) runs once per model into EMBED_ONNX_DIR, so
+# later processes load the ONNX file directly. Written to a scratch directory
+# and renamed into place, so concurrent first loads never see a half-written
+# model; an installed model is never removed. When another process installed
+# it first, only a quantized file it lacks is moved in, itself atomically.
+def _onnx_model(model_name, quantize):
+    path = os.path.join(os.path.abspath(EMBED_ONNX_DIR), model_name.replace("/", "--"))
+    if os.path.exists(os.path.join(path, "onnx", _onnx_file(quantize))):
+        return path
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    scratch = f"{path}.{os.getpid()}.tmp"
+    model   = SentenceTransformer(path if os.path.exists(path) else model_name, backend="onnx")
+    try:
+        model.save(scratch)
+        if quantize:
+            export_dynamic_quantized_onnx_model(model, quantize, scratch)
+        try:
+            if not os.path.exists(path):
+                os.rename(scratch, path)
+                return path
+        except OSError:
+            pass
+        target = os.path.join(path, "onnx", _onnx_file(quantize))
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(os.path.join(scratch, "onnx", _onnx_file(quantize)), target)
+        return path
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def base_embeddings(model_name, backend=EMBED_BACKEND, quantize=EMBED_QUANTIZE, threads=EMBED_THREADS,
+                    batch_size=EMBED_BATCH_SIZE):
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    encode = {"batch_size": batch_size}
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return HuggingFaceEmbeddings(model_name=model_name, encode_kwargs=encode)
+    if backend != "onnx":
+        raise ValueError(f"unknown embedding backend {backend!r}")
+
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    return HuggingFaceEmbeddings(
+        model_name=_onnx_model(model_name, quantize), encode_kwargs=encode,
+        model_kwargs={"backend": "onnx", "model_kwargs": {
+            "file_name": _onnx_file(quantize), "provider": "CPUExecutionProvider", "session_options": options,
+        }},
+    )
+
+
+def chunk_key(model_name, text):
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{model_name}\0{normalized}".encode()).hexdigest()
+
+
+# ── CHUNK EMBEDDING CACHE ──────────────────────────────────────────────────────
+# Append-only store per model: vectors.f32 holds float32 rows, keys.txt holds one
+# chunk hash per row. A key line is only written after its vector, so the key
+# file doubles as the commit log and a torn append is simply ignored on reload.
+class CachedEmbeddings(Embeddings):
+    def __init__(self, base, model_name, root=EMBED_CACHE_DIR):
+        self.base       = base
+        self.model_name = model_name
+        self.dir        = os.path.join(os.path.abspath(root), hashlib.sha256(model_name.encode()).hexdigest()[:16])
+        self.stats      = Counter()
+        self._rows      = {}
+        self._dim       = None
+        self._matrix    = None
+        self._keys_end  = 0
+        self._lock      = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+        with self._file_lock():
+            self._sync()
+
+    def _path(self, name):
+        return os.path.join(self.dir, name)
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self._path("lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # Picks up rows appended by other processes since the last sync.
+    def _sync(self):
+        if not os.path.exists(self._path("keys.txt")):
+            return
+        with open(self._path("keys.txt"), "rb") as f:
+            lines = [line for line in f if line.endswith(b"\n")]
+        self._keys_end = sum(len(line) for line in lines)
+        keys = [line.strip().decode() for line in lines]
+        if len(keys) == len(self._rows):
+            return
+        if self._dim is None:
+            with open(self._path("dim")) as f:
+                self._dim = int(f.read())
+        for i, k in enumerate(keys[len(self._rows):], start=len(self._rows)):
+            self._rows[k] = i
+        self._matrix = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r",
+                                 shape=(len(keys), self._dim))
+
+    # Overwrites anything past the committed end, dropping torn writes.
+    def _write_at(self, name, offset, data):
+        with open(self._path(name), "r+b" if os.path.exists(self._path(name)) else "wb") as f:
+            f.seek(offset)
+            f.write(data)
+            f.truncate()
+
+    def _append(self, keys, vectors):
+        with self._file_lock():
+            self._sync()
+            fresh = [(k, v) for k, v in zip(keys, vectors) if k not in self._rows]
+            if not fresh:
+                return
+            block = np.asarray([v for _, v in fresh], dtype=np.float32)
+            if self._dim is None:
+                self._dim = block.shape[1]
+                with open(self._path("dim"), "w") as f:
+                    f.write(str(self._dim))
+            self._write_at("vectors.f32", len(self._rows) * self._dim * 4, block.tobytes())
+            self._write_at("keys.txt", self._keys_end, "".join(f"{k}\n" for k, _ in fresh).encode())
+            self._sync()
+
+    # ── EMBEDDINGS INTERFACE ───────────────────────────────────────────────────
+    def embed_documents(self, texts):
+        keys = [chunk_key(self.model_name, t) for t in texts]
+        with self._lock:
+            missing = {k: t for k, t in zip(keys, texts) if k not in self._rows}
+            # Another process (a bulk indexing worker) may have embedded them.
+            if missing:
+                with self._file_lock():
+                    self._sync()
+                missing = {k: t for k, t in missing.items() if k not in self._rows}
+        if missing:
+            vectors = timed_call("external", "embed_documents", self.base.embed_documents, list(missing.values()))
+            with self._lock:
+                self._append(list(missing), vectors)
+        with self._lock:
+            self.stats["hits"]     += len(texts) - len(missing)
+            self.stats["computed"] += len(missing)
+            return [self._matrix[self._rows[k]].tolist() for k in keys]
+
+    def embed_query(self, text):
+        return timed_call("external", "embed_query", self.base.embed_query, text)
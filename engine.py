@@ -0,0 +1,387 @@
+import asyncio
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from functools import lru_cache
+
+from agent import build_agent
+from answer_cache import SemanticCache
+from config import (LLM_MODEL, GRADE_MODEL, EMBED_MODEL, EMBED_BACKEND, EMBED_QUANTIZE, CHUNK_SIZE,
+                    CHUNK_OVERLAP, SPECULATIVE_SEARCH, BATCH_WORKERS)
+from context import CONTEXT_STATS
+from corpus import Corpus
+from embeddings import CachedEmbeddings, base_embeddings, embedding_id
+from grading import GRADER_STATS
+from hybrid import RETRIEVAL_STATS
+from index_store import IndexStore, ResidentIndexes, index_key
+from llm import LLMClient, RoutedClassifier, load_llm
+from metrics import LLM_METRICS, REGISTRY, finish_trace, start_trace
+from search import SEARCH_STATS, SearchCache, WebSearch
+
+BUILD_TIMES = {}
+EMBED_ID    = embedding_id(EMBED_MODEL)
+
+REGISTRY.view("rag_retrieval", RETRIEVAL_STATS.summary, "Hybrid retrieval queries and lexical-only hits")
+REGISTRY.view("rag_grader", GRADER_STATS.summary, "Chunks graded locally vs escalated to the LLM")
+REGISTRY.view("rag_search", SEARCH_STATS.summary, "Web search cache and speculation counters")
+REGISTRY.view("rag_context", CONTEXT_STATS.summary, "Prompt context tokens before and after packing")
+REGISTRY.view("rag_build_seconds", BUILD_TIMES, "Cold build time of shared resources")
+
+
+def _timed_build(name, fn):
+    t0 = time.perf_counter()
+    obj = fn()
+    BUILD_TIMES[name] = time.perf_counter() - t0
+    return obj
+
+
+# ── SHARED RESOURCES ───────────────────────────────────────────────────────────
+# Tavily's tool pulls in aiohttp and most of langchain_community; only engines
+# without an injected search tool pay for it.
+def _tavily(api_key):
+    from langchain_community.tools.tavily_search import TavilySearchResults
+
+    return TavilySearchResults(k=3, tavily_api_key=api_key)
+
+
+# The small model relevance checks are routed to; unset, or the same model as
+# generation, sends them to the large model. Injected LLMs grade with
+# themselves unless a grading LLM is injected too.
+def _grade_llm(groq_key):
+    if not GRADE_MODEL or GRADE_MODEL == LLM_MODEL:
+        return None
+    return _timed_build("grade_llm", lambda: load_llm(GRADE_MODEL, groq_key))
+
+
+# Built once per process and shared by every engine, whatever its API keys.
+@lru_cache(maxsize=None)
+def load_embeddings(model_name, backend=EMBED_BACKEND, quantize=EMBED_QUANTIZE):
+    return _timed_build("embeddings", lambda: CachedEmbeddings(
+        base_embeddings(model_name, backend, quantize), embedding_id(model_name, backend, quantize)
+    ))
+
+
+@lru_cache(maxsize=None)
+def load_index_store():
+    return IndexStore()
+
+
+@lru_cache(maxsize=None)
+def resident_indexes():
+    return ResidentIndexes()
+
+
+@lru_cache(maxsize=None)
+def search_cache():
+    return SearchCache()
+
+
+@lru_cache(maxsize=None)
+def load_corpus(embeddings):
+    return Corpus(embeddings)
+
+
+# Everything the first upload or question would otherwise wait for: the search
+# and ingestion stacks, the embedding model and the index store. The UI runs
+# it in the background once the first page is out.
+def prewarm():
+    for module in ("ingest", "langchain_community.tools.tavily_search"):
+        importlib.import_module(module)
+    load_embeddings(EMBED_MODEL)
+    load_index_store()
+
+
+# ── ENGINE ─────────────────────────────────────────────────────────────────────
+# Raised for a question about a document whose indexing failed: what the job
+# left behind was never committed and is not searched.
+class IndexingFailed(RuntimeError):
+    pass
+
+
+# Everything a client needs to index PDFs and ask questions, independent of any
+# UI. Documents are addressed by their index key; a key stays queryable while
+# its ingestion job is still running. Uploads either get an index of their own
+# or join the shared corpus. Components can be injected for tests.
+class Engine:
+    def __init__(self, groq_key=None, tavily_key=None, llm=None, search_tool=None, embeddings=None, store=None,
+                 speculative=SPECULATIVE_SEARCH, corpus=None, resident=None, grade_llm=None):
+        self.embeddings   = embeddings or load_embeddings(EMBED_MODEL)
+        self.store        = store or load_index_store()
+        self.resident     = resident or resident_indexes()
+        self.llm          = LLMClient(llm) if llm else _timed_build("llm", lambda: load_llm(LLM_MODEL, groq_key))
+        self.web          = WebSearch(search_tool or _tavily(tavily_key), search_cache())
+        self.answers      = SemanticCache(self.embeddings)
+        self.grader       = RoutedClassifier(LLMClient(grade_llm) if grade_llm else None if llm
+                                             else _grade_llm(groq_key), self.llm)
+        self.agent        = _timed_build("agent", lambda: build_agent(self.llm, self.web, speculative, self.grader))
+        self.jobs         = {}
+        self.corpus_jobs  = {}
+        self._corpus      = corpus
+        self._lock        = threading.Lock()
+        self._ingest_lock = threading.Lock()
+        REGISTRY.view("rag_index_store", self.store.summary, "Persisted index cache")
+        REGISTRY.view("rag_resident_indexes", self.resident.summary, "Indexes open in memory")
+        REGISTRY.view("rag_chunk_embeddings", self.embeddings.stats, "Chunk embedding cache")
+        REGISTRY.view("rag_answer_cache", self.answers.stats, "Semantic answer cache")
+        REGISTRY.view("rag_llm_client", self.llm.summary, "LLM client queue depth, coalescing and retries")
+        REGISTRY.view("rag_llm_routing", self.grader.summary, "Classification calls by model and escalations")
+
+    # ── DOCUMENTS ──────────────────────────────────────────────────────────────
+    def ingest(self, data, name=""):
+        key = index_key(data, CHUNK_SIZE, CHUNK_OVERLAP, EMBED_ID)
+        with self._ingest_lock:
+            return self._ingest(key, data, name)
+
+    def _ingest(self, key, data, name):
+        from ingest import IngestJob, iter_pages, parse_pool
+
+        with self._lock:
+            job = self.jobs.get(key)
+            if job and not job.error:
+                return key
+        if self.resident.get(key) is not None:
+            return key
+        if job:
+            job.vectorstore.close()
+        vectorstore = self.store.attach(key, self.embeddings)
+        if vectorstore is not None:
+            self.resident.put(key, vectorstore)
+            return key
+
+        index = self.store.create(key, self.embeddings)
+
+        def finish():
+            self.store.commit(key, index, name, protected=self.resident.in_use())
+            self.resident.put(key, index)
+            with self._lock:
+                self.jobs.pop(key, None)
+
+        with self._lock:
+            self.jobs[key] = IngestJob(iter_pages(data, parse_pool(), name=name), index, on_complete=finish).start()
+        return key
+
+    def vectorstore(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            if key in self.jobs:
+                return self.jobs[key].vectorstore
+        vectorstore = self.resident.get(key)
+        if vectorstore is not None:
+            return vectorstore
+        # Closed, indexed by another process or before a restart: attach on demand.
+        vectorstore = self.store.attach(key, self.embeddings)
+        return self.resident.put(key, vectorstore) if vectorstore is not None else None
+
+    def is_indexing(self, key):
+        with self._lock:
+            return key in self.jobs and not self.jobs[key].done.is_set()
+
+    # Answered from memory or the manifest; a status check never opens an index.
+    def document_status(self, key):
+        with self._lock:
+            job = self.jobs.get(key)
+        if job is None:
+            ready = self.resident.get(key) is not None or self.store.has(key)
+            return {"key": key, "state": "ready" if ready else "unknown"}
+        return self._job_status(key, job)
+
+    def _job_status(self, key, job):
+        return {
+            "key":        key,
+            "state":      "error" if job.error else "ready" if job.done.is_set() else "indexing",
+            "error":      str(job.error) if job.error else None,
+            "counts":     dict(job.counts),
+            "throughput": job.throughput(),
+            "elapsed":    job.elapsed(),
+        }
+
+    # ── SHARED CORPUS ──────────────────────────────────────────────────────────
+    # Opened on first use; engines sharing embeddings share one corpus.
+    @property
+    def corpus(self):
+        with self._lock:
+            if self._corpus is None:
+                self._corpus = load_corpus(self.embeddings)
+            return self._corpus
+
+    def add_to_corpus(self, data, name=""):
+        from ingest import IngestJob, iter_pages, parse_pool
+
+        key    = index_key(data, CHUNK_SIZE, CHUNK_OVERLAP, EMBED_ID)
+        corpus = self.corpus
+        with self._ingest_lock:
+            with self._lock:
+                _, job = self.corpus_jobs.get(key, (None, None))
+            if (job and not job.error) or corpus.has(key):
+                return key
+            if job:
+                corpus.remove(key)
+
+            def finish():
+                with self._lock:
+                    _, job = self.corpus_jobs[key]
+                corpus.commit(key, name, job.counts["embedded"])
+                with self._lock:
+                    self.corpus_jobs.pop(key, None)
+
+            # A failed document's chunks leave the shared collection; the job
+            # stays listed with its error until the file is added again.
+            def failed(error):
+                corpus.remove(key)
+
+            pages = corpus.tag(key, name, iter_pages(data, parse_pool(), name=name))
+            with self._lock:
+                self.corpus_jobs[key] = (name, IngestJob(pages, corpus.index, on_complete=finish,
+                                                         on_error=failed).start())
+        return key
+
+    def remove_from_corpus(self, key):
+        if self._corpus_indexing([key]):
+            return False
+        self.corpus.remove(key)
+        with self._lock:
+            self.corpus_jobs.pop(key, None)
+        return True
+
+    def corpus_documents(self):
+        with self._lock:
+            jobs = dict(self.corpus_jobs)
+        docs = [{**d, "state": "ready"} for d in self.corpus.documents() if d["key"] not in jobs]
+        return docs + [{**self._job_status(key, job), "name": name} for key, (name, job) in jobs.items()]
+
+    def _corpus_indexing(self, keys):
+        with self._lock:
+            running = {k for k, (_, job) in self.corpus_jobs.items() if not job.done.is_set()}
+        return bool(running & set(keys)) if keys else bool(running)
+
+    # ── QUESTIONS ──────────────────────────────────────────────────────────────
+    # Both stream flavours yield the same events: {"type": "node"} per finished
+    # graph node, {"type": "token"} per generated token and a closing
+    # {"type": "done"} carrying the answer, links, prompt token counts and the
+    # question's trace (per-node and per-call timings, LLM token usage).
+    # A question targets one uploaded document, the shared corpus (`corpus` is
+    # the list of document keys to search, empty for all of it) or the web.
+    def _scope(self, doc_key, corpus):
+        if corpus is None:
+            with self._lock:
+                job = self.jobs.get(doc_key)
+            if job is not None and job.error:
+                raise IndexingFailed(f"indexing document {doc_key} failed: {job.error}")
+            return doc_key or "web", {"vectorstore": self.vectorstore(doc_key)}
+        docs = sorted(corpus)
+        return (f"corpus@{self.corpus.version}:{','.join(docs) or '*'}",
+                {"vectorstore": self.corpus.index, "doc_keys": docs})
+
+    # Keeps the document's index open until the question is answered.
+    def _lease(self, doc_key, corpus):
+        return self.resident.lease(doc_key) if doc_key and corpus is None else nullcontext()
+
+    # Answers are cached only once every document they drew on is committed:
+    # over a partial index they would go stale, or outlive a failed job. Jobs
+    # leave the table when they commit, so a job still listed is running or
+    # has failed. A failed corpus job removes its chunks before it is marked
+    # done, so for the corpus only jobs still running matter.
+    def _unsettled(self, doc_key, corpus):
+        if corpus is not None:
+            return self._corpus_indexing(corpus)
+        with self._lock:
+            return doc_key in self.jobs
+
+    def _events(self, mode, payload, final):
+        if mode == "updates":
+            for node, output in payload.items():
+                final.update(output or {})
+                yield {"type": "node", "node": node}
+        elif payload[1].get("langgraph_node") == "generate" and payload[0].content:
+            yield {"type": "token", "text": payload[0].content}
+
+    def _done(self, question, scope, unsettled, qvec, final, trace):
+        answer, links = final.get("generation", ""), final.get("links", [])
+        if not unsettled:
+            self.answers.store(scope, qvec, question, answer, links)
+        REGISTRY.inc("rag_questions_total", help="Questions answered", source="graph")
+        return {"type": "done", "answer": answer, "links": links,
+                "prompt_tokens": final.get("prompt_tokens"), "cached": None, "trace": finish_trace(trace)}
+
+    def _cached(self, scope, qvec, trace):
+        hit = self.answers.lookup(scope, qvec)
+        if hit:
+            REGISTRY.inc("rag_questions_total", help="Questions answered", source="cache")
+            return {"type": "done", "answer": hit["answer"], "links": hit["links"],
+                    "prompt_tokens": None, "cached": hit["similarity"], "trace": finish_trace(trace)}
+
+    def stream(self, question, doc_key=None, corpus=None):
+        trace = start_trace(question)
+        qvec  = self.answers.embed(question)
+        with self._lease(doc_key, corpus):
+            scope, inputs = self._scope(doc_key, corpus)
+            hit           = self._cached(scope, qvec, trace)
+            if hit:
+                yield hit
+                return
+            final  = {}
+            config = {"callbacks": [LLM_METRICS]}
+            inputs = {"question": question, "qvec": qvec.tolist(), **inputs}
+            for mode, payload in self.agent.stream(inputs, config, stream_mode=["updates", "messages"]):
+                yield from self._events(mode, payload, final)
+            yield self._done(question, scope, self._unsettled(doc_key, corpus), qvec, final, trace)
+
+    async def astream(self, question, doc_key=None, corpus=None):
+        trace = start_trace(question)
+        qvec  = await asyncio.to_thread(self.answers.embed, question)
+        with self._lease(doc_key, corpus):
+            scope, inputs = await asyncio.to_thread(self._scope, doc_key, corpus)
+            hit           = self._cached(scope, qvec, trace)
+            if hit:
+                yield hit
+                return
+            final  = {}
+            config = {"callbacks": [LLM_METRICS]}
+            inputs = {"question": question, "qvec": qvec.tolist(), **inputs}
+            async for mode, payload in self.agent.astream(inputs, config, stream_mode=["updates", "messages"]):
+                for event in self._events(mode, payload, final):
+                    yield event
+            yield self._done(question, scope, self._unsettled(doc_key, corpus), qvec, final, trace)
+
+    def ask(self, question, doc_key=None, corpus=None):
+        return [e for e in self.stream(question, doc_key, corpus) if e["type"] == "done"][0]
+
+    async def aask(self, question, doc_key=None, corpus=None):
+        return [e async for e in self.astream(question, doc_key, corpus) if e["type"] == "done"][0]
+
+    # ── BATCH ──────────────────────────────────────────────────────────────────
+    # Runs many questions against the same document or corpus on a bounded
+    # pool and yields one result per question as soon as it is answered, so not
+    # in input order (`index` is the input position). A question repeated in
+    # the batch (same words, any case or spacing) runs once and its copies
+    # share the answer; near-duplicates answered later hit the answer cache,
+    # and identical grading prompts in flight share one LLM call. A failed
+    # question reports its error without stopping the rest.
+    def batch(self, questions, doc_key=None, corpus=None, workers=BATCH_WORKERS):
+        groups = {}
+        for i, question in enumerate(questions):
+            groups.setdefault(" ".join(question.lower().split()), []).append(i)
+        pool = ThreadPoolExecutor(max(1, min(workers, len(groups))), thread_name_prefix="rag-batch")
+        try:
+            futures = {pool.submit(self._batch_one, questions[ix[0]], doc_key, corpus): ix
+                       for ix in groups.values()}
+            for future in as_completed(futures):
+                first, *copies = futures[future]
+                result = future.result()
+                yield {"index": first, "question": questions[first], **result, "duplicate_of": None}
+                for i in copies:
+                    yield {"index": i, "question": questions[i], **result, "duplicate_of": first}
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _batch_one(self, question, doc_key, corpus):
+        t0 = time.perf_counter()
+        try:
+            done   = self.ask(question, doc_key, corpus)
+            result = {"answer": done["answer"], "links": done["links"], "cached": done["cached"], "error": None}
+        except Exception as e:
+            result = {"answer": "", "links": [], "cached": None, "error": str(e)}
+        return {**result, "latency_ms": (time.perf_counter() - t0) * 1000}
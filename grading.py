@@ -0,0 +1,58 @@
+import math
+from functools import lru_cache
+
+from config import (GRADE_CONCURRENCY, PREGRADE_HIGH, PREGRADE_LOW,
+                    CROSS_ENCODER_MODEL, CROSS_ENCODER_HIGH, CROSS_ENCODER_LOW)
+from metrics import Stats
+
+GRADE_PROMPT = (
+    "Is this context relevant to the question? Answer only yes or no.\n"
+    "Question: {question}\nContext: {context}"
+)
+
+GRADER_STATS = Stats()
+
+
+# ── LOCAL PRE-GRADER ───────────────────────────────────────────────────────────
+# Decisive scores settle relevance on CPU; only the band between the low and
+# high thresholds is escalated to the LLM. Scores are the cosine relevance
+# Chroma already returns, or cross-encoder probabilities when one is configured.
+@lru_cache(maxsize=1)
+def load_cross_encoder(model_name):
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name, device="cpu")
+
+
+def local_scores(question, documents, scores):
+    if not CROSS_ENCODER_MODEL:
+        return scores, PREGRADE_HIGH, PREGRADE_LOW
+    logits = load_cross_encoder(CROSS_ENCODER_MODEL).predict([(question, d) for d in documents])
+    return [1 / (1 + math.exp(-x)) for x in logits], CROSS_ENCODER_HIGH, CROSS_ENCODER_LOW
+
+
+def pregrade(scores, high, low):
+    def verdict(score):
+        if score is None or low <= score < high:
+            return None
+        return score >= high
+    return [verdict(s) for s in scores]
+
+
+# ── RELEVANCE GRADING ──────────────────────────────────────────────────────────
+# One yes/no call per ambiguous chunk, fanned out through Runnable.batch so
+# wall-clock time stays close to a single call for the usual k=4 retrieval.
+def grade_chunks(llm, question, documents, scores=None, max_concurrency=GRADE_CONCURRENCY):
+    if not documents:
+        return []
+    verdicts  = pregrade(*local_scores(question, documents, scores)) if scores else [None] * len(documents)
+    ambiguous = [i for i, v in enumerate(verdicts) if v is None]
+    if ambiguous:
+        replies = llm.batch(
+            [GRADE_PROMPT.format(question=question, context=documents[i]) for i in ambiguous],
+            config={"max_concurrency": max_concurrency},
+        )
+        for i, r in zip(ambiguous, replies):
+            verdicts[i] = "yes" in r.content.lower()
+    GRADER_STATS.add(graded_locally=len(documents) - len(ambiguous), escalated=len(ambiguous),
+                     questions_without_llm=int(not ambiguous))
+    return verdicts
@@ -0,0 +1,308 @@
+import json
+import math
+import os
+import re
+import threading
+import uuid
+from array import array
+from collections import Counter
+
+import numpy as np
+from langchain_core.documents import Document
+
+from config import (RETRIEVE_K, RETRIEVE_FETCH_K, RRF_K, DENSE_WEIGHT, LEXICAL_WEIGHT, BM25_K1, BM25_B,
+                    PREGRADE_LOW, QUANTIZED_RERANK)
+from metrics import Stats
+
+RETRIEVAL_STATS = Stats()
+
+# Fixed cost of an open Chroma directory (its system, sqlite connections and
+# caches), measured at roughly 5 MB whatever the collection size.
+CHROMA_OPEN_BYTES = 5 * 2**20
+
+# Part numbers, versions and hyphenated names ("XR-4471", "v2.3", "Navier-Stokes")
+# are kept whole and also split into their parts.
+_TOKEN     = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_PART      = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what "
+    "when where which who why how with does do did".split()
+)
+
+
+def tokenize(text):
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        parts = _PART.findall(token)
+        tokens += [token] + parts if len(parts) > 1 else parts
+    return [t for t in tokens if t not in _STOPWORDS]
+
+
+# ── LEXICAL INDEX ──────────────────────────────────────────────────────────────
+# BM25 over the same chunks as the vectorstore, keyed by their Chroma ids.
+# Postings are typed arrays (4-byte row, 2-byte term frequency) so the index
+# stays a few bytes per token; it is filled batch by batch during ingestion
+# and saved next to the Chroma directory when the build commits. Each row also
+# records its document, so a shared corpus can be searched by document subset.
+class LexicalIndex:
+    FILE = "lexical.npz"
+
+    def __init__(self):
+        self.ids       = []
+        self.lengths   = array("I")
+        self.doc_of    = array("I")
+        self.doc_keys  = []
+        self.postings  = {}
+        self._doc_rows = {}
+        self._tokens   = 0
+        self._lock     = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Approximate: array buffers plus a flat allowance per id and per term.
+    def nbytes(self):
+        with self._lock:
+            postings = sum(len(r) * 4 + len(t) * 2 + 120 for r, t in self.postings.values())
+            return postings + len(self.ids) * 80 + len(self.lengths) * 4 + len(self.doc_of) * 4
+
+    def _doc(self, key):
+        if key not in self._doc_rows:
+            self._doc_rows[key] = len(self.doc_keys)
+            self.doc_keys.append(key)
+        return self._doc_rows[key]
+
+    def add(self, ids, texts, doc_keys=None):
+        with self._lock:
+            for chunk_id, text, doc in zip(ids, texts, doc_keys or [""] * len(ids)):
+                row    = len(self.ids)
+                tokens = tokenize(text)
+                self.ids.append(chunk_id)
+                self.lengths.append(len(tokens))
+                self.doc_of.append(self._doc(doc))
+                self._tokens += len(tokens)
+                for term, tf in Counter(tokens).items():
+                    rows, tfs = self.postings.setdefault(term, (array("I"), array("H")))
+                    rows.append(row)
+                    tfs.append(min(tf, 65535))
+
+    def search(self, query, k, doc_keys=None):
+        with self._lock:
+            n = len(self.ids)
+            if not n:
+                return []
+            terms   = [p for p in map(self.postings.get, set(tokenize(query))) if p]
+            lengths = np.array(self.lengths, dtype=np.float32)
+            avg     = max(self._tokens / n, 1.0)
+            scores  = np.zeros(n, dtype=np.float32)
+            for rows, tfs in terms:
+                rows = np.array(rows, dtype=np.int64)
+                tfs  = np.array(tfs, dtype=np.float32)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / avg)
+                idf  = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+                scores[rows] += idf * tfs * (BM25_K1 + 1) / (tfs + norm)
+            if doc_keys:
+                allowed = [self._doc_rows[d] for d in doc_keys if d in self._doc_rows]
+                scores[~np.isin(np.array(self.doc_of, dtype=np.uint32), allowed)] = 0
+            top = np.flatnonzero(scores)
+            top = top[np.argsort(-scores[top], kind="stable")[:k]]
+            return [(self.ids[i], float(scores[i])) for i in top]
+
+    # Documents that still have rows; `doc_keys` keeps dropped ones too, as
+    # row numbers refer to it.
+    def live_doc_keys(self):
+        with self._lock:
+            return {self.doc_keys[i] for i in np.unique(np.array(self.doc_of, dtype=np.uint32))}
+
+    # Rows of a removed document are compacted away and the rest renumbered.
+    def drop(self, doc_key):
+        with self._lock:
+            if doc_key not in self._doc_rows:
+                return
+            doc_of = np.array(self.doc_of, dtype=np.uint32)
+            keep   = doc_of != self._doc_rows[doc_key]
+            if keep.all():
+                return
+            remap  = np.cumsum(keep) - 1
+            for term, (rows, tfs) in list(self.postings.items()):
+                r, t = np.array(rows, dtype=np.int64), np.array(tfs, dtype=np.uint16)
+                live = keep[r]
+                if live.any():
+                    self.postings[term] = (array("I", remap[r[live]].astype(np.uint32).tobytes()),
+                                           array("H", t[live].tobytes()))
+                else:
+                    del self.postings[term]
+            lengths       = np.array(self.lengths, dtype=np.uint32)
+            self._tokens -= int(lengths[~keep].sum())
+            self.ids      = [i for i, k in zip(self.ids, keep) if k]
+            self.lengths  = array("I", lengths[keep].tobytes())
+            self.doc_of   = array("I", doc_of[keep].tobytes())
+
+    # ── PERSISTENCE ────────────────────────────────────────────────────────────
+    def save(self, path):
+        with self._lock:
+            terms   = sorted(self.postings)
+            offsets = np.cumsum([0] + [len(self.postings[t][0]) for t in terms])
+            rows    = np.concatenate([np.array(self.postings[t][0], dtype=np.uint32) for t in terms] or [[]])
+            tfs     = np.concatenate([np.array(self.postings[t][1], dtype=np.uint16) for t in terms] or [[]])
+            np.savez(os.path.join(path, self.FILE),
+                     terms=json.dumps(terms), ids=json.dumps(self.ids), doc_keys=json.dumps(self.doc_keys),
+                     offsets=offsets, rows=rows.astype(np.uint32), tfs=tfs.astype(np.uint16),
+                     lengths=np.array(self.lengths, dtype=np.uint32),
+                     doc_of=np.array(self.doc_of, dtype=np.uint32))
+
+    @classmethod
+    def load(cls, path):
+        file = os.path.join(path, cls.FILE)
+        if not os.path.exists(file):
+            return None
+        index = cls()
+        with np.load(file) as data:
+            terms, offsets = json.loads(str(data["terms"])), data["offsets"]
+            rows, tfs      = data["rows"], data["tfs"]
+            index.ids      = json.loads(str(data["ids"]))
+            index.lengths  = array("I", data["lengths"].tobytes())
+            index._tokens  = int(data["lengths"].sum())
+            if "doc_of" in data:
+                index.doc_keys = json.loads(str(data["doc_keys"]))
+                index.doc_of   = array("I", data["doc_of"].tobytes())
+            else:
+                index.doc_keys = [""]
+                index.doc_of   = array("I", bytes(4 * len(index.ids)))
+            index._doc_rows = {k: i for i, k in enumerate(index.doc_keys)}
+            for i, term in enumerate(terms):
+                start, stop = offsets[i], offsets[i + 1]
+                index.postings[term] = (array("I", rows[start:stop].tobytes()),
+                                        array("H", tfs[start:stop].tobytes()))
+        return index
+
+    # Indexes committed before lexical search existed are rebuilt from the
+    # chunks Chroma already stores.
+    @classmethod
+    def from_vectorstore(cls, vectorstore):
+        index = cls()
+        data  = vectorstore.get(include=["documents", "metadatas"])
+        index.add(data["ids"], data["documents"], [(m or {}).get("doc_key", "") for m in data["metadatas"]])
+        return index
+
+
+# ── HYBRID INDEX ───────────────────────────────────────────────────────────────
+# Wraps a Chroma collection and its lexical index behind the vectorstore calls
+# the rest of the app uses, so ingestion and the graph's retrieve node are
+# unchanged. Both retrievers return `fetch_k` candidates (2·k by default),
+# fused with weighted reciprocal rank fusion. A deep candidate list lets chunks
+# ranked middling by both retrievers outscore an exact match only BM25 finds,
+# so it stays shallow. Every fused hit is scored by cosine relevance (the
+# collection uses cosine space) so the pre-grader's thresholds still apply,
+# except that a lexical match is never scored below PREGRADE_LOW: exact terms
+# are what embeddings miss, so those chunks go to the LLM grader instead of
+# being rejected on similarity alone.
+# With quantized `vectors` the dense side searches those instead, and Chroma
+# stores each chunk's text and metadata under a one-element placeholder
+# vector, so its HNSW graph costs next to nothing.
+class HybridIndex:
+    def __init__(self, vectorstore, lexical, path, vectors=None):
+        self.vectorstore = vectorstore
+        self.lexical     = lexical
+        self.path        = path
+        self.vectors     = vectors
+
+    def add_documents(self, documents):
+        texts = [d.page_content for d in documents]
+        docs  = [d.metadata.get("doc_key", "") for d in documents]
+        if self.vectors is None:
+            ids = self.vectorstore.add_documents(documents)
+        else:
+            ids = [str(uuid.uuid4()) for _ in documents]
+            self.vectors.add(ids, self.vectorstore.embeddings.embed_documents(texts), docs)
+            self.vectorstore._collection.add(ids=ids, embeddings=[[1.0]] * len(ids), documents=texts,
+                                             metadatas=[d.metadata or None for d in documents])
+        self.lexical.add(ids, texts, docs)
+        return ids
+
+    def save(self):
+        self.lexical.save(self.path)
+        if self.vectors is not None:
+            self.vectors.save()
+
+    # What the open index costs in memory: the directory's fixed overhead,
+    # float32 vectors plus HNSW links (~2·M neighbours of 4 bytes at the base
+    # layer) and the lexical index.
+    def resident_bytes(self):
+        collection = self.vectorstore._collection
+        count      = collection.count()
+        size       = CHROMA_OPEN_BYTES + self.lexical.nbytes()
+        if self.vectors is not None:
+            return size + self.vectors.nbytes() + count * 136
+        if not count:
+            return size
+        dim = len(collection.get(limit=1, include=["embeddings"])["embeddings"][0])
+        return size + count * (4 * dim + 128)
+
+    # Releases chromadb's in-process system for this directory once no other
+    # client holds it; the data stays on disk.
+    def close(self):
+        self.vectorstore._client.close()
+
+    # Dense hits as (document, cosine relevance), best first.
+    def _dense(self, qvec, fetch_k, doc_keys):
+        if self.vectors is None:
+            where = {"doc_key": {"$in": list(doc_keys)}} if doc_keys else None
+            hits  = self.vectorstore.similarity_search_by_vector_with_relevance_scores(
+                qvec, k=fetch_k, filter=where)
+            return [(doc, 1 - distance) for doc, distance in hits]
+        hits = self.vectors.search(qvec, fetch_k, QUANTIZED_RERANK, doc_keys)
+        if not hits:
+            return []
+        data = self.vectorstore.get(ids=[i for i, _ in hits], include=["documents", "metadatas"])
+        rows = dict(zip(data["ids"], zip(data["documents"], data["metadatas"])))
+        return [(Document(page_content=rows[i][0], metadata=rows[i][1] or {}), score)
+                for i, score in hits if i in rows]
+
+    # Cosine of each lexical hit against the query, with its text and metadata.
+    def _lexical_rows(self, qvec, ids):
+        if self.vectors is not None:
+            data   = self.vectorstore.get(ids=ids, include=["documents", "metadatas"])
+            cosine = self.vectors.similarity(data["ids"], qvec)
+            return {i: (text, meta, cosine[i])
+                    for i, text, meta in zip(data["ids"], data["documents"], data["metadatas"]) if i in cosine}
+        data = self.vectorstore.get(ids=ids, include=["documents", "metadatas", "embeddings"])
+        q    = np.asarray(qvec, dtype=np.float32)
+        rows = {}
+        for i, text, meta, vector in zip(data["ids"], data["documents"], data["metadatas"], data["embeddings"]):
+            vector  = np.asarray(vector, dtype=np.float32)
+            rows[i] = (text, meta, float(q @ vector / max(np.linalg.norm(q) * np.linalg.norm(vector), 1e-12)))
+        return rows
+
+    # `doc_keys` restricts both retrievers to those documents (all if empty).
+    # `qvec` is the query's embedding when the caller already has it (the
+    # engine embeds each question once, for the answer cache); every score
+    # here is cosine, so its scale does not matter.
+    def similarity_search_with_relevance_scores(self, query, k=RETRIEVE_K, fetch_k=RETRIEVE_FETCH_K,
+                                                dense_weight=DENSE_WEIGHT, lexical_weight=LEXICAL_WEIGHT,
+                                                doc_keys=None, qvec=None):
+        fetch_k = fetch_k or 2 * k
+        qvec    = self.vectorstore.embeddings.embed_query(query) if qvec is None else qvec
+        dense   = self._dense(qvec, fetch_k, doc_keys) if dense_weight else []
+        lexical = self.lexical.search(query, fetch_k, doc_keys) if lexical_weight else []
+
+        found, fused = {}, Counter()
+        for rank, (doc, relevance) in enumerate(dense):
+            found.setdefault(doc.page_content, (doc, relevance))
+            fused[doc.page_content] += dense_weight / (RRF_K + rank + 1)
+        if lexical:
+            rows = self._lexical_rows(qvec, [i for i, _ in lexical])
+            for rank, (chunk_id, _) in enumerate(lexical):
+                if chunk_id not in rows:
+                    continue
+                text, meta, cosine = rows[chunk_id]
+                if text not in found:
+                    found[text] = (Document(page_content=text, metadata=meta or {}), cosine)
+                doc, score  = found[text]
+                found[text] = (doc, max(score, PREGRADE_LOW))
+                fused[text] += lexical_weight / (RRF_K + rank + 1)
+
+        top        = [text for text, _ in fused.most_common(k)]
+        dense_set  = {d.page_content for d, _ in dense[:k]}
+        RETRIEVAL_STATS.add(lexical_only=sum(t not in dense_set for t in top), queries=1)
+        return [found[text] for text in top]
@@ -0,0 +1,291 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import closing, contextmanager
+
+from langchain_community.vectorstores import Chroma
+
+from config import INDEX_DIR, INDEX_MAX_MB, INDEX_MAX_ENTRIES, INDEX_RESIDENT_MB, INGEST_BATCH_SIZE, VECTOR_STORAGE
+from hybrid import HybridIndex, LexicalIndex
+from ingest import batched
+from quantized import QuantizedVectors
+
+STALE_BUILD_S = 3600
+
+
+# ── KEYS ───────────────────────────────────────────────────────────────────────
+def index_key(data, chunk_size, chunk_overlap, embed_model):
+    content = hashlib.sha256(data).hexdigest()
+    params  = f"{chunk_size}:{chunk_overlap}:{embed_model}"
+    return hashlib.sha256(f"{content}|{params}".encode()).hexdigest()[:32]
+
+
+def _dir_bytes(path):
+    return sum(
+        os.path.getsize(os.path.join(root, f))
+        for root, _, files in os.walk(path) for f in files
+    )
+
+
+# ── INDEX STORE ────────────────────────────────────────────────────────────────
+# One Chroma directory, plus its lexical index, per (document, chunking,
+# embedding model). The sqlite
+# manifest is the source of truth: a build only becomes visible once its row is
+# committed, so half-written directories from crashed builds are never attached.
+# `storage` ("float" or "int8") applies to new builds; an index keeps the
+# storage it was built with.
+class IndexStore:
+    def __init__(self, root=INDEX_DIR, max_bytes=INDEX_MAX_MB * 2**20, max_entries=INDEX_MAX_ENTRIES,
+                 storage=VECTOR_STORAGE):
+        root = os.path.abspath(root)
+        os.makedirs(root, exist_ok=True)
+        self.root        = root
+        self.max_bytes   = max_bytes
+        self.max_entries = max_entries
+        self.storage     = storage
+        self.stats       = Counter()
+        self._locks      = {}
+        self._guard      = threading.Lock()
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS indexes ("
+            "key TEXT PRIMARY KEY, path TEXT, name TEXT, bytes INTEGER, created REAL, last_used REAL)"
+        )
+        self._execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+
+    # ── MANIFEST ───────────────────────────────────────────────────────────────
+    def _execute(self, sql, args=()):
+        with closing(sqlite3.connect(os.path.join(self.root, "manifest.sqlite"), timeout=30)) as db:
+            with db:
+                return db.execute(sql, args).fetchall()
+
+    def _bump(self, name):
+        self.stats[name] += 1
+        self._execute(
+            "INSERT INTO stats VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,)
+        )
+
+    def _lock(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _lookup(self, key):
+        rows = self._execute("SELECT path FROM indexes WHERE key = ?", (key,))
+        return rows[0][0] if rows and os.path.isdir(rows[0][0]) else None
+
+    def has(self, key):
+        return self._lookup(key) is not None
+
+    def summary(self):
+        count, size = self._execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM indexes")[0]
+        totals = dict(self._execute("SELECT name, value FROM stats"))
+        return {"indexes": count, "bytes": size, "hits": totals.get("hits", 0),
+                "rebuilds": totals.get("rebuilds", 0)}
+
+    # ── ATTACH / BUILD ─────────────────────────────────────────────────────────
+    def _open(self, path, embeddings, vectors=None):
+        vectorstore = Chroma(
+            collection_name="chunks",
+            embedding_function=embeddings,
+            persist_directory=path,
+            collection_metadata={"hnsw:space": "cosine"},
+        )
+        lexical = LexicalIndex.load(path)
+        if lexical is None:
+            lexical = LexicalIndex.from_vectorstore(vectorstore)
+            if len(lexical):
+                lexical.save(path)
+        if vectors is None:
+            vectors = QuantizedVectors.load(path)
+        return HybridIndex(vectorstore, lexical, path, vectors)
+
+    def attach(self, key, embeddings):
+        path = self._lookup(key)
+        if path is None:
+            return None
+        self._execute("UPDATE indexes SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._bump("hits")
+        return self._open(path, embeddings)
+
+    # Opens a fresh, uncommitted directory: chromadb caches clients by path, so
+    # an evicted-then-rebuilt index must never reuse its old location.
+    def create(self, key, embeddings):
+        path = os.path.join(self.root, f"{key}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(path)
+        return self._open(path, embeddings, QuantizedVectors(path) if self.storage == "int8" else None)
+
+    def commit(self, key, index, name="", protected=()):
+        index.save()
+        now = time.time()
+        self._execute(
+            "INSERT OR REPLACE INTO indexes VALUES (?, ?, ?, ?, ?, ?)",
+            (key, index.path, name, _dir_bytes(index.path), now, now),
+        )
+        self._bump("rebuilds")
+        self.evict(keep=key, protected=protected)
+
+    # Chunks go in INGEST_BATCH_SIZE at a time: Chroma rejects larger adds.
+    def build(self, key, chunks, embeddings, name=""):
+        with self._lock(key):
+            if self._lookup(key):
+                return self.attach(key, embeddings)
+            index = self.create(key, embeddings)
+            for batch in batched(chunks, INGEST_BATCH_SIZE):
+                index.add_documents(batch)
+            self.commit(key, index, name)
+        return index
+
+    # ── EVICTION ───────────────────────────────────────────────────────────────
+    # `protected` keys (indexes open in this process, held by a session or
+    # leased by a running question) are never deleted from under their users,
+    # even if that leaves the store over its limits for now.
+    def evict(self, keep=None, protected=()):
+        rows  = self._execute("SELECT key, path, bytes FROM indexes ORDER BY last_used ASC")
+        total = sum(r[2] for r in rows)
+        count = len(rows)
+        for key, path, size in rows:
+            if total <= self.max_bytes and count <= self.max_entries:
+                break
+            if key == keep or key in protected:
+                continue
+            self._execute("DELETE FROM indexes WHERE key = ?", (key,))
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            count -= 1
+            self._bump("evictions")
+        self._sweep_orphans()
+
+    def _sweep_orphans(self):
+        live = {r[0] for r in self._execute("SELECT path FROM indexes")}
+        for entry in os.scandir(self.root):
+            if (entry.is_dir() and entry.path not in live
+                    and time.time() - entry.stat().st_mtime > STALE_BUILD_S):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+# ── RESIDENT INDEXES ───────────────────────────────────────────────────────────
+# The per-document indexes open in this process, shared by every engine and
+# session. A session holds the document it is working on and releases it when
+# it clears or replaces the file or ends; the last release closes the index.
+# Indexes opened without a holder (HTTP clients) stay open as a cache. Past
+# the memory cap the least recently used are closed, unheld ones first. A
+# closed index keeps its data in the index store and is reattached on next
+# use; an index leased by a running question is never closed under it.
+class ResidentIndexes:
+    def __init__(self, max_bytes=INDEX_RESIDENT_MB * 2**20):
+        self.max_bytes = max_bytes
+        self.stats     = Counter()
+        self._indexes  = OrderedDict()
+        self._holders  = defaultdict(set)
+        self._leases   = Counter()
+        self._released = set()
+        self._lock     = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._indexes:
+                return None
+            self._indexes.move_to_end(key)
+            return self._indexes[key][0]
+
+    # The first index put under a key wins; a duplicate opened concurrently
+    # is closed and the resident one returned.
+    def put(self, key, index):
+        size = index.resident_bytes()
+        with self._lock:
+            if key in self._indexes:
+                resident, close = self._indexes[key][0], [index]
+            else:
+                self._indexes[key] = (index, size)
+                self._released.discard(key)
+                self.stats["opened"] += 1
+                resident, close = index, self._evict(keep=key)
+        self._close(close)
+        return resident
+
+    # ── HOLDERS ────────────────────────────────────────────────────────────────
+    def acquire(self, key, session):
+        with self._lock:
+            self._holders[key].add(session)
+            self._released.discard(key)
+
+    # Releases one key, or everything the session holds.
+    def release(self, session, key=None):
+        with self._lock:
+            keys = [key] if key else [k for k, s in self._holders.items() if session in s]
+            for k in keys:
+                if session not in self._holders.get(k, ()):
+                    continue
+                self._holders[k].discard(session)
+                if not self._holders[k]:
+                    del self._holders[k]
+                    self._released.add(k)
+            close = self._drop_released()
+        self._close(close)
+
+    # Releases the holdings of sessions that have ended without saying so.
+    def reap(self, is_alive):
+        with self._lock:
+            sessions = {s for holders in self._holders.values() for s in holders}
+        for session in sessions:
+            if not is_alive(session):
+                self.release(session)
+
+    @contextmanager
+    def lease(self, key):
+        with self._lock:
+            self._leases[key] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._leases[key] -= 1
+                if not self._leases[key]:
+                    del self._leases[key]
+                close = self._drop_released() + self._evict()
+            self._close(close)
+
+    # Keys the index store must not delete: open, held or leased here.
+    def in_use(self):
+        with self._lock:
+            return set(self._indexes) | set(self._holders) | set(self._leases)
+
+    # ── EVICTION ───────────────────────────────────────────────────────────────
+    def _drop_released(self):
+        close = []
+        for key in list(self._released):
+            if key in self._leases:
+                continue
+            self._released.discard(key)
+            if key in self._indexes:
+                close.append(self._indexes.pop(key)[0])
+                self.stats["released"] += 1
+        return close
+
+    def _evict(self, keep=None):
+        total = sum(size for _, size in self._indexes.values())
+        close = []
+        for key in sorted(self._indexes, key=lambda k: k in self._holders):
+            if total <= self.max_bytes:
+                break
+            if key == keep or key in self._leases:
+                continue
+            index, size = self._indexes.pop(key)
+            total -= size
+            close.append(index)
+            self.stats["evictions"] += 1
+        return close
+
+    def _close(self, indexes):
+        for index in indexes:
+            index.close()
+
+    def summary(self):
+        with self._lock:
+            return {"resident": len(self._indexes), "bytes": sum(s for _, s in self._indexes.values()),
+                    "held": len(self._holders), "sessions": len({s for h in self._holders.values() for s in h}),
+                    **self.stats}
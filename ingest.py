@@ -0,0 +1,167 @@
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import get_context
+
+from langchain_community.document_loaders.parsers import PyPDFParser
+from langchain_core.document_loaders import Blob
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+from config import (CHUNK_SIZE, CHUNK_OVERLAP, INGEST_BATCH_SIZE,
+                    PARSE_WORKERS, PARSE_MIN_PAGES, PARSE_PAGES_PER_TASK)
+
+_pool      = None
+_pool_lock = threading.Lock()
+
+
+# ── PARALLEL PARSING ───────────────────────────────────────────────────────────
+# Workers are spawned rather than forked (the app process runs threads and
+# torch), so the pool is created once per process and reused across uploads.
+def parse_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None and PARSE_WORKERS > 1:
+            _pool = ProcessPoolExecutor(PARSE_WORKERS, mp_context=get_context("spawn"))
+        return _pool
+
+
+# Mirrors PyPDFParser's default "plain" extraction for pages without images.
+def _extract_range(path, start, stop):
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text(extraction_mode="plain").strip() for i in range(start, stop)]
+
+
+# ── STAGES ─────────────────────────────────────────────────────────────────────
+# `source` is a path or the uploaded bytes, parsed in place without a copy on
+# disk; `name` is recorded as the pages' source for bytes. Workers need a
+# file, so a large upload is written once to a temp file of its own, removed
+# when the pages are exhausted or abandoned. At most `window` page ranges are
+# in flight at a time (two per pool worker by default).
+def iter_pages(source, pool=None, min_pages=PARSE_MIN_PAGES, pages_per_task=PARSE_PAGES_PER_TASK, name=None,
+               window=2 * PARSE_WORKERS):
+    in_memory = isinstance(source, bytes)
+    blob      = Blob.from_data(source, path=name) if in_memory else Blob.from_path(source)
+    pages     = PyPDFParser().lazy_parse(blob)
+    reader    = PdfReader(io.BytesIO(source) if in_memory else source)
+    total     = len(reader.pages)
+    if pool is None or total < min_pages:
+        yield from pages
+        return
+
+    # Page 0 comes from the serial parser so every page carries exactly the
+    # document-level metadata PyPDFLoader would have produced.
+    first = next(pages)
+    pages.close()
+    yield first
+    path    = source
+    pending = deque()
+    if in_memory:
+        fd, path = tempfile.mkstemp(prefix="rag_upload_", suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+    try:
+        labels = reader.page_labels
+        ranges = iter([(s, min(s + pages_per_task, total)) for s in range(1, total, pages_per_task)])
+        # A bounded window of in-flight ranges keeps results in page order
+        # without parsing far ahead of the embedding stage.
+        while True:
+            while len(pending) < window and (r := next(ranges, None)):
+                pending.append((r, pool.submit(_extract_range, path, *r)))
+            if not pending:
+                return
+            (start, stop), future = pending.popleft()
+            for i, text in zip(range(start, stop), future.result()):
+                yield Document(page_content=text, metadata={**first.metadata, "page": i, "page_label": labels[i]})
+    finally:
+        for _, future in pending:
+            future.cancel()
+        if in_memory:
+            os.remove(path)
+
+
+def iter_chunks(pages, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for page in pages:
+        yield from splitter.split_documents([page])
+
+
+def batched(items, size):
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+# ── INGEST JOB ─────────────────────────────────────────────────────────────────
+# Streams page → chunks → fixed-size embedding batches into an open vectorstore
+# on a background thread. At most one page and one batch are held in memory,
+# and the vectorstore is queryable while later batches are still being added.
+# `on_error` runs before the job is marked done, so whatever it cleans up is
+# gone by the time the failure is visible.
+class IngestJob:
+    def __init__(self, pages, vectorstore, batch_size=INGEST_BATCH_SIZE, on_complete=None, on_error=None):
+        self.pages       = pages
+        self.vectorstore = vectorstore
+        self.batch_size  = batch_size
+        self.on_complete = on_complete
+        self.on_error    = on_error
+        self.counts      = Counter()
+        self.seconds     = Counter()
+        self.error       = None
+        self.started     = None
+        self.done        = threading.Event()
+
+    def _timed(self, stage, items, unit):
+        it = iter(items)
+        while True:
+            t0 = time.perf_counter()
+            item = next(it, None)
+            self.seconds[stage] += time.perf_counter() - t0
+            if item is None:
+                return
+            self.counts[unit] += 1
+            yield item
+
+    def run(self):
+        self.started = time.perf_counter()
+        try:
+            pages  = self._timed("parse", self.pages, "pages")
+            chunks = self._timed("split", iter_chunks(pages), "chunks")
+            for batch in batched(chunks, self.batch_size):
+                t0 = time.perf_counter()
+                self.vectorstore.add_documents(batch)
+                self.seconds["embed"]   += time.perf_counter() - t0
+                self.counts["embedded"] += len(batch)
+            if self.on_complete:
+                self.on_complete()
+        except Exception as e:
+            self.error = e
+            if self.on_error:
+                self.on_error(e)
+        finally:
+            self.done.set()
+        return self
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    # split time is measured around the chunk generator, which pulls pages
+    # itself, so parse time is subtracted to report each stage on its own.
+    def throughput(self):
+        parse = self.seconds["parse"]
+        split = max(self.seconds["split"] - parse, 1e-9)
+        return {
+            "parse": self.counts["pages"]    / max(parse, 1e-9),
+            "split": self.counts["chunks"]   / split,
+            "embed": self.counts["embedded"] / max(self.seconds["embed"], 1e-9),
+        }
+
+    def elapsed(self):
+        return time.perf_counter() - self.started if self.started else 0.0
@@ -0,0 +1,209 @@
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from functools import lru_cache
+
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+
+from config import (LLM_TEMPERATURE, LLM_REQUESTS_PER_S, LLM_BURST, LLM_MAX_RETRIES, LLM_BACKOFF_S,
+                    LLM_BACKOFF_MAX_S, LLM_MAX_CONNECTIONS)
+from metrics import REGISTRY
+
+
+def _retryable(e):
+    from groq import APIConnectionError
+
+    status = getattr(e, "status_code", None)
+    return status == 429 or (status or 0) >= 500 or isinstance(e, APIConnectionError)
+
+
+def _retry_after(e):
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+# ── LLM CLIENT ─────────────────────────────────────────────────────────────────
+# Every call the graph makes goes through one client per model and API key:
+# a token bucket paces requests, 429s and server errors are retried with
+# full-jitter exponential backoff (or the server's retry-after), and identical
+# prompts already in flight, typically the same chunk graded for the same
+# question in two sessions, share one upstream call. Streams are paced and
+# retried until their first chunk but never shared, each caller relaying its
+# own tokens. Runs inside the caller's context, so LLM callbacks and graph
+# streaming still see every upstream call.
+class LLMClient:
+    def __init__(self, model, requests_per_s=LLM_REQUESTS_PER_S, burst=LLM_BURST, max_retries=LLM_MAX_RETRIES,
+                 backoff_s=LLM_BACKOFF_S, backoff_max_s=LLM_BACKOFF_MAX_S):
+        self.model         = model
+        self.limiter       = (InMemoryRateLimiter(requests_per_second=requests_per_s, max_bucket_size=burst,
+                                                  check_every_n_seconds=0.02) if requests_per_s else None)
+        self.max_retries   = max_retries
+        self.backoff_s     = backoff_s
+        self.backoff_max_s = backoff_max_s
+        self.stats         = Counter()
+        self._inflight     = {}
+        self._queued       = 0
+        self._active       = 0
+        self._lock         = threading.Lock()
+        # The bucket starts full, so the first burst (one question's grading
+        # fan-out) goes out at once instead of queueing behind the refill.
+        if self.limiter:
+            self.limiter.available_tokens = burst
+
+    def summary(self):
+        with self._lock:
+            return {"queued": self._queued, "in_flight": self._active, **self.stats}
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _gauge(self, name, delta):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    def _acquire(self):
+        if self.limiter is None:
+            return
+        self._gauge("_queued", 1)
+        try:
+            self.limiter.acquire()
+        finally:
+            self._gauge("_queued", -1)
+
+    # Sleeps before the next attempt, or re-raises when it should not retry.
+    def _backoff(self, attempt, e):
+        if attempt >= self.max_retries or not _retryable(e):
+            self._count("failures")
+            raise e
+        reason = "rate_limited" if getattr(e, "status_code", None) == 429 else "error"
+        self._count("retries")
+        REGISTRY.inc("rag_llm_retries_total", help="LLM calls retried after a rate limit or error", reason=reason)
+        time.sleep(_retry_after(e) or random.uniform(0, min(self.backoff_max_s, self.backoff_s * 2 ** attempt)))
+
+    def _upstream(self, prompt):
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            self._gauge("_active", 1)
+            self._count("calls")
+            try:
+                return self.model.invoke(prompt)
+            except Exception as e:
+                error = e
+            finally:
+                self._gauge("_active", -1)
+            self._backoff(attempt, error)
+
+    # ── CALLS ──────────────────────────────────────────────────────────────────
+    def invoke(self, prompt):
+        with self._lock:
+            future = self._inflight.get(prompt)
+            leader = future is None
+            if leader:
+                future = self._inflight[prompt] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            return future.result()
+        try:
+            result = self._upstream(prompt)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(prompt, None)
+
+    def batch(self, prompts, config=None):
+        workers = min(len(prompts), (config or {}).get("max_concurrency") or len(prompts))
+        if workers <= 1:
+            return [self.invoke(p) for p in prompts]
+        with ContextThreadPoolExecutor(workers) as pool:
+            return list(pool.map(self.invoke, prompts))
+
+    def stream(self, prompt):
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            self._gauge("_active", 1)
+            self._count("calls")
+            started = False
+            try:
+                for chunk in self.model.stream(prompt):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started:
+                    self._count("failures")
+                    raise
+                error = e
+            finally:
+                self._gauge("_active", -1)
+            self._backoff(attempt, error)
+
+
+# ── MODEL ROUTING ──────────────────────────────────────────────────────────────
+# Classification calls (relevance grading today) go to a small instant model;
+# only replies that are not one of the expected labels, or a batch the small
+# model failed outright, are asked again of the large model. Groq returns no
+# logprobs, so a well-formed one-word label is the confidence signal. With no
+# small model every call goes to the large one.
+class RoutedClassifier:
+    def __init__(self, small, large, labels=("yes", "no")):
+        self.small  = small
+        self.large  = large
+        self.labels = labels
+        self.stats  = Counter()
+        self._lock  = threading.Lock()
+
+    def summary(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def _count(self, **counts):
+        with self._lock:
+            self.stats.update(counts)
+
+    def confident(self, reply):
+        words = reply.content.strip().lower().split() if reply is not None else []
+        return bool(words) and words[0].strip(".,!:;\"'") in self.labels
+
+    def batch(self, prompts, config=None):
+        if self.small is None:
+            self._count(large=len(prompts))
+            return self.large.batch(prompts, config)
+        try:
+            replies = self.small.batch(prompts, config)
+        except Exception:
+            self._count(small_failures=1)
+            replies = [None] * len(prompts)
+        unsure = [i for i, r in enumerate(replies) if not self.confident(r)]
+        self._count(small=len(prompts), escalated=len(unsure))
+        if unsure:
+            REGISTRY.inc("rag_llm_escalations_total", len(unsure),
+                          help="Classification calls re-asked of the large model")
+            for i, r in zip(unsure, self.large.batch([prompts[i] for i in unsure], config)):
+                replies[i] = r
+        return replies
+
+
+# One pooled HTTP client per model and key, shared by every engine using them;
+# the SDK's own retries are off since the client above retries.
+@lru_cache(maxsize=None)
+def load_llm(model, api_key):
+    import httpx
+    from langchain_groq import ChatGroq
+
+    return LLMClient(ChatGroq(
+        model=model, temperature=LLM_TEMPERATURE, api_key=api_key, max_retries=0,
+        http_client=httpx.Client(limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                                                     max_keepalive_connections=LLM_MAX_CONNECTIONS)),
+    ))
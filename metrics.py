@@ -0,0 +1,223 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import TRACE_FILE
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_trace = ContextVar("rag_trace", default=None)
+
+
+def _labels(labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}" if labels else ""
+
+
+# ── REGISTRY ───────────────────────────────────────────────────────────────────
+# Minimal Prometheus-compatible registry: counters and histograms keyed by
+# label set, plus views onto the stats other modules keep.
+class Registry:
+    def __init__(self):
+        self._lock     = threading.Lock()
+        self._help     = {}
+        self._counters = defaultdict(float)
+        self._hists    = {}
+        self._views    = {}
+
+    def inc(self, metric, value=1, help="", **labels):
+        with self._lock:
+            self._help.setdefault(metric, ("counter", help))
+            self._counters[(metric, tuple(sorted(labels.items())))] += value
+
+    def observe(self, metric, seconds, help="", **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(metric, ("histogram", help))
+            counts, total = self._hists.get(key, ([0] * (len(BUCKETS) + 1), 0.0))
+            counts[bisect_left(BUCKETS, seconds)] += 1
+            self._hists[key] = (counts, total + seconds)
+
+    # `stats` is a mapping or a callable returning one; registering a name
+    # again replaces the previous view.
+    def view(self, name, stats, help=""):
+        self._views[name] = (stats, help)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (kind, help) in sorted(self._help.items()):
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                for (n, labels), value in sorted(self._counters.items()):
+                    if n == name:
+                        lines.append(f"{name}{_labels(dict(labels))} {value:g}")
+                for (n, labels), (counts, total) in sorted(self._hists.items()):
+                    if n != name:
+                        continue
+                    running = 0
+                    for bound, c in zip(BUCKETS + ("+Inf",), counts):
+                        running += c
+                        lines.append(f"{name}_bucket{_labels({**dict(labels), 'le': bound})} {running}")
+                    lines.append(f"{name}_sum{_labels(dict(labels))} {total:g}")
+                    lines.append(f"{name}_count{_labels(dict(labels))} {running}")
+        for name, (stats, help) in sorted(self._views.items()):
+            values = stats() if callable(stats) else stats
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            lines += [f"{name}{_labels({'stat': k})} {v:g}" for k, v in sorted(dict(values).items())]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# Module-level stats bumped from graph nodes on executor threads: updates and
+# the snapshot the registry renders go through one lock.
+class Stats(Counter):
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            self.update(counts)
+
+    def summary(self):
+        with self._lock:
+            return dict(self)
+
+
+# ── TRACES ─────────────────────────────────────────────────────────────────────
+# One trace per question, carried in a context variable so graph nodes and LLM
+# callbacks running on executor threads all add to the same record.
+class Trace:
+    def __init__(self, question):
+        self.question = question
+        self.started  = time.perf_counter()
+        self.spans    = []
+        self.tokens   = defaultdict(lambda: {"input": 0, "output": 0, "calls": 0})
+        self.models   = defaultdict(lambda: {"input": 0, "output": 0, "calls": 0, "ms": 0.0})
+
+    def span(self, kind, name, seconds, **extra):
+        self.spans.append({"kind": kind, "name": name, "ms": round(seconds * 1000, 2), **extra})
+
+    def summary(self):
+        return {
+            "question": self.question,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "spans":    self.spans,
+            "tokens":   dict(self.tokens),
+            "models":   dict(self.models),
+        }
+
+
+def start_trace(question):
+    trace = Trace(question)
+    _current_trace.set(trace)
+    return trace
+
+
+def finish_trace(trace):
+    summary = trace.summary()
+    if TRACE_FILE:
+        with open(TRACE_FILE, "a") as f:
+            f.write(json.dumps({"at": time.time(), **summary}) + "\n")
+    return summary
+
+
+# ── INSTRUMENTATION ────────────────────────────────────────────────────────────
+def timed_call(kind, name, fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        REGISTRY.inc("rag_errors_total", help="Failed node and external calls", kind=kind, name=name)
+        raise
+    finally:
+        took = time.perf_counter() - t0
+        REGISTRY.observe(f"rag_{kind}_seconds", took, help=f"Latency of {kind} calls", name=name)
+        trace = _current_trace.get()
+        if trace:
+            trace.span(kind, name, took)
+
+
+def instrument_node(name, fn):
+    def node(state):
+        out = timed_call("node", name, fn, state)
+        if out.get("search_needed") == "yes":
+            REGISTRY.inc("rag_web_fallback_total", help="Questions routed to web search")
+        return out
+    return node
+
+
+# Token usage and latency of every LLM call, attributed to the graph node
+# that made it via the metadata LangGraph attaches to child runs, and to the
+# model that answered it, so routing savings show per node and model.
+def _run_labels(metadata):
+    metadata = metadata or {}
+    return metadata.get("langgraph_node", "none"), metadata.get("ls_model_name", "unknown")
+
+
+class LLMMetrics(BaseCallbackHandler):
+    def __init__(self):
+        self._runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._runs[run_id] = (*_run_labels(metadata), time.perf_counter())
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._runs[run_id] = (*_run_labels(metadata), time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        node, model, t0 = self._runs.pop(run_id, ("none", "unknown", time.perf_counter()))
+        took   = time.perf_counter() - t0
+        usage  = {}
+        labels = {"node": node, "model": model}
+        for gens in response.generations:
+            for g in gens:
+                usage = getattr(getattr(g, "message", None), "usage_metadata", None) or usage
+        REGISTRY.observe("rag_llm_seconds", took, help="Latency of LLM calls", **labels)
+        REGISTRY.inc("rag_llm_calls_total", help="LLM calls", **labels)
+        REGISTRY.inc("rag_llm_tokens_total", usage.get("input_tokens", 0), help="LLM tokens", kind="input", **labels)
+        REGISTRY.inc("rag_llm_tokens_total", usage.get("output_tokens", 0), help="LLM tokens", kind="output", **labels)
+        trace = _current_trace.get()
+        if trace:
+            trace.span("llm", node, took, tokens=usage.get("total_tokens", 0), model=model)
+            for entry in (trace.tokens[node], trace.models[model]):
+                entry["input"]  += usage.get("input_tokens", 0)
+                entry["output"] += usage.get("output_tokens", 0)
+                entry["calls"]  += 1
+            trace.models[model]["ms"] += round(took * 1000, 2)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        node, _, _ = self._runs.pop(run_id, ("none", "unknown", 0))
+        REGISTRY.inc("rag_errors_total", help="Failed node and external calls", kind="llm", name=node)
+
+    def on_retry(self, retry_state, *, run_id, **kwargs):
+        REGISTRY.inc("rag_retries_total", help="Retried upstream calls")
+
+
+LLM_METRICS = LLMMetrics()
+
+
+# ── ENDPOINT ───────────────────────────────────────────────────────────────────
+# For deployments without the HTTP API (e.g. Streamlit only).
+def serve_metrics(port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = REGISTRY.render().encode()
+            self.send_response(200 if self.path == "/metrics" else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.end_headers()
+            self.wfile.write(body if self.path == "/metrics" else b"")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
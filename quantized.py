@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from config import INGEST_BATCH_SIZE
+
+
+# ── QUANTIZED VECTORS ──────────────────────────────────────────────────────────
+# Int8 copies of an index's chunk vectors: one byte per dimension plus a
+# per-vector scale, a quarter of float32, scanned block by block at query time.
+# The normalized float32 vectors are appended to a file beside them and only
+# memory-mapped, so the exact re-rank of the best candidates pages in just the
+# rows it reads. Rows are in insertion order and record their document, like
+# the lexical index, so a shared corpus can be filtered by document.
+class QuantizedVectors:
+    CODES  = "vectors.npz"
+    FLOATS = "vectors.f32"
+    BLOCK  = 2048
+
+    def __init__(self, path, dim=0):
+        self.path      = path
+        self.dim       = dim
+        self.ids       = []
+        self.doc_keys  = []
+        self.codes     = np.zeros((0, dim), dtype=np.int8)
+        self.scales    = np.zeros(0, dtype=np.float32)
+        self.doc_of    = np.zeros(0, dtype=np.uint32)
+        self._pending  = []
+        self._rows     = {}
+        self._doc_rows = {}
+        self._floats   = None
+        self._lock     = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nbytes(self):
+        with self._lock:
+            self._flush()
+            return self.codes.nbytes + self.scales.nbytes + self.doc_of.nbytes + len(self.ids) * 80
+
+    def _doc(self, key):
+        if key not in self._doc_rows:
+            self._doc_rows[key] = len(self.doc_keys)
+            self.doc_keys.append(key)
+        return self._doc_rows[key]
+
+    # Batches are concatenated lazily, so a bulk load does not copy the whole
+    # code matrix once per batch.
+    def _flush(self):
+        if self._pending:
+            codes, scales, docs = zip(*self._pending)
+            self.codes    = np.concatenate([self.codes, *codes])
+            self.scales   = np.concatenate([self.scales, *scales])
+            self.doc_of   = np.concatenate([self.doc_of, *docs])
+            self._pending = []
+
+    def _mapped(self):
+        if self._floats is None or len(self._floats) != len(self.ids):
+            self._floats = np.memmap(os.path.join(self.path, self.FLOATS), dtype=np.float32, mode="r",
+                                     shape=(len(self.ids), self.dim))
+        return self._floats
+
+    def add(self, ids, vectors, doc_keys=None):
+        v = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        v /= np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+        scales = np.maximum(np.abs(v).max(axis=1), 1e-12) / 127
+        codes  = np.round(v / scales[:, None]).astype(np.int8)
+        with self._lock:
+            if not self.dim:
+                self.dim   = v.shape[1]
+                self.codes = np.zeros((0, self.dim), dtype=np.int8)
+            with open(os.path.join(self.path, self.FLOATS), "ab") as f:
+                f.write(v.tobytes())
+            docs = np.array([self._doc(d) for d in doc_keys or [""] * len(ids)], dtype=np.uint32)
+            self._pending.append((codes, scales.astype(np.float32), docs))
+            self._rows.update((chunk_id, len(self.ids) + i) for i, chunk_id in enumerate(ids))
+            self.ids.extend(ids)
+
+    # ── SEARCH ─────────────────────────────────────────────────────────────────
+    # Approximate scores over the codes pick `rerank` candidates; their exact
+    # cosine from the float file decides the order and the returned score.
+    def search(self, qvec, k, rerank, doc_keys=None):
+        with self._lock:
+            self._flush()
+            n = len(self.ids)
+            if not n:
+                return []
+            q      = np.asarray(qvec, dtype=np.float32)
+            q     /= max(float(np.linalg.norm(q)), 1e-12)
+            scores = np.empty(n, dtype=np.float32)
+            for start in range(0, n, self.BLOCK):
+                scores[start:start + self.BLOCK] = self.codes[start:start + self.BLOCK].astype(np.float32) @ q
+            scores *= self.scales
+            if doc_keys:
+                allowed = [self._doc_rows[d] for d in doc_keys if d in self._doc_rows]
+                scores[~np.isin(self.doc_of, allowed)] = -np.inf
+            m    = min(max(rerank, k), n)
+            cand = np.argpartition(-scores, m - 1)[:m]
+            cand = np.sort(cand[np.isfinite(scores[cand])])
+            if not len(cand):
+                return []
+            exact = self._mapped()[cand] @ q
+            order = np.argsort(-exact, kind="stable")[:k]
+            return [(self.ids[cand[i]], float(exact[i])) for i in order]
+
+    def similarity(self, ids, qvec):
+        with self._lock:
+            rows = [(i, self._rows[i]) for i in ids if i in self._rows]
+            if not rows:
+                return {}
+            q     = np.asarray(qvec, dtype=np.float32)
+            q     = q / max(float(np.linalg.norm(q)), 1e-12)
+            exact = self._mapped()[[r for _, r in rows]] @ q
+            return {chunk_id: float(s) for (chunk_id, _), s in zip(rows, exact)}
+
+    # Rows of a removed document are compacted away, rewriting the float file.
+    def drop(self, doc_key):
+        with self._lock:
+            if doc_key not in self._doc_rows:
+                return
+            self._flush()
+            keep = self.doc_of != self._doc_rows[doc_key]
+            if keep.all():
+                return
+            file = os.path.join(self.path, self.FLOATS)
+            with open(file + ".tmp", "wb") as f:
+                floats = self._mapped()
+                for start in range(0, len(keep), self.BLOCK):
+                    f.write(np.ascontiguousarray(floats[start:start + self.BLOCK][keep[start:start + self.BLOCK]]))
+            self._floats = None
+            os.replace(file + ".tmp", file)
+            self.codes  = self.codes[keep]
+            self.scales = self.scales[keep]
+            self.doc_of = self.doc_of[keep]
+            self.ids    = [i for i, k in zip(self.ids, keep) if k]
+            self._rows  = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+
+    # ── PERSISTENCE ────────────────────────────────────────────────────────────
+    def save(self):
+        with self._lock:
+            self._flush()
+            np.savez(os.path.join(self.path, self.CODES),
+                     ids=json.dumps(self.ids), doc_keys=json.dumps(self.doc_keys), dim=self.dim,
+                     codes=self.codes, scales=self.scales, doc_of=self.doc_of)
+
+    # Floats appended after the last save (a build that never committed) are
+    # truncated away.
+    @classmethod
+    def load(cls, path):
+        file = os.path.join(path, cls.CODES)
+        if not os.path.exists(file):
+            return None
+        with np.load(file) as data:
+            index          = cls(path, int(data["dim"]))
+            index.ids      = json.loads(str(data["ids"]))
+            index.doc_keys = json.loads(str(data["doc_keys"]))
+            index.codes    = data["codes"]
+            index.scales   = data["scales"]
+            index.doc_of   = data["doc_of"]
+        index._rows     = {chunk_id: row for row, chunk_id in enumerate(index.ids)}
+        index._doc_rows = {k: i for i, k in enumerate(index.doc_keys)}
+        floats = os.path.join(path, cls.FLOATS)
+        if os.path.exists(floats) and os.path.getsize(floats) > len(index.ids) * index.dim * 4:
+            os.truncate(floats, len(index.ids) * index.dim * 4)
+        return index
+
+    # Chroma keeps only text for quantized indexes, so a lagging index is
+    # rebuilt by embedding the stored chunks again (cache hits, normally).
+    @classmethod
+    def from_vectorstore(cls, vectorstore, path):
+        index = cls(path)
+        if os.path.exists(os.path.join(path, cls.FLOATS)):
+            os.remove(os.path.join(path, cls.FLOATS))
+        data = vectorstore.get(include=["documents", "metadatas"])
+        for start in range(0, len(data["ids"]), INGEST_BATCH_SIZE):
+            stop = start + INGEST_BATCH_SIZE
+            index.add(data["ids"][start:stop],
+                      vectorstore.embeddings.embed_documents(data["documents"][start:stop]),
+                      [(m or {}).get("doc_key", "") for m in data["metadatas"][start:stop]])
+        return index
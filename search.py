@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+from config import SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL_S
+from metrics import Stats, timed_call
+
+SEARCH_STATS = Stats()
+_speculative = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative-search")
+
+
+def _normalize(query):
+    return " ".join(query.lower().split())
+
+
+# ── RESULT CACHE ───────────────────────────────────────────────────────────────
+class SearchCache:
+    def __init__(self, max_entries=SEARCH_CACHE_SIZE, ttl_s=SEARCH_CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s       = ttl_s
+        self._entries    = OrderedDict()
+        self._lock       = threading.Lock()
+
+    def get(self, query):
+        key = _normalize(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_s:
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, query, results):
+        with self._lock:
+            self._entries[_normalize(query)] = (time.monotonic(), results)
+            self._entries.move_to_end(_normalize(query))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# ── WEB SEARCH ─────────────────────────────────────────────────────────────────
+# Speculative searches run on a shared pool and always land in the cache, so a
+# search started for a question that grading later answered from the PDF still
+# pays off when the same question comes back. They run in a copy of the
+# caller's context, so their spans and metrics join the question's trace.
+class WebSearch:
+    def __init__(self, tool, cache=None):
+        self.tool  = tool
+        self.cache = cache or SearchCache()
+
+    def search(self, query):
+        results = self.cache.get(query)
+        if results is not None:
+            SEARCH_STATS.add(cache_hits=1)
+            return results
+        SEARCH_STATS.add(upstream_calls=1)
+        results = timed_call("external", "web_search", self.tool.invoke, {"query": query})
+        self.cache.put(query, results)
+        return results
+
+    def _timed_search(self, query):
+        t0 = time.perf_counter()
+        return self.search(query), time.perf_counter() - t0
+
+    def speculate(self, query):
+        SEARCH_STATS.add(speculative_launched=1)
+        return _speculative.submit(copy_context().run, self._timed_search, query)
+
+    def discard(self):
+        SEARCH_STATS.add(speculative_discarded=1)
+
+    # Whatever part of the search ran while grading is latency we did not pay.
+    def collect(self, pending):
+        t0 = time.perf_counter()
+        results, took = pending.result()
+        waited = time.perf_counter() - t0
+        SEARCH_STATS.add(speculative_used=1, latency_saved_ms=int(max(took - waited, 0) * 1000))
+        return results
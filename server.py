@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from config import BATCH_MAX_QUESTIONS
+from engine import Engine
+from metrics import REGISTRY
+
+
+# ── LIFESPAN ───────────────────────────────────────────────────────────────────
+# One engine per process: every request shares the same models, caches and
+# indexes. The engine is synchronous: every call into it, graph nodes included,
+# runs on the event loop's executor, never on the loop itself.
+@asynccontextmanager
+async def lifespan(app):
+    app.state.engine = await asyncio.to_thread(
+        Engine, os.environ["GROQ_API_KEY"], os.environ["TAVILY_API_KEY"]
+    )
+    yield
+
+
+app = FastAPI(title="Dani Tech · RAG", lifespan=lifespan)
+
+
+# `corpus` searches the shared corpus instead of one document: a list of
+# document keys to filter by, or an empty list for the whole corpus.
+class Question(BaseModel):
+    question: str
+    document: Optional[str]       = None
+    corpus:   Optional[List[str]] = None
+
+
+class Batch(BaseModel):
+    questions: List[str]
+    document:  Optional[str]       = None
+    corpus:    Optional[List[str]] = None
+
+
+def _engine():
+    return app.state.engine
+
+
+# A document whose indexing failed is not answered from its partial index.
+async def _check_document(key):
+    status = await asyncio.to_thread(_engine().document_status, key) if key else None
+    if status and status["state"] == "unknown":
+        raise HTTPException(404, f"unknown document {key}")
+    if status and status["state"] == "error":
+        raise HTTPException(409, f"indexing document {key} failed: {status['error']}")
+
+
+async def _corpus_keys():
+    return {d["key"] for d in await asyncio.to_thread(_engine().corpus_documents)}
+
+
+async def _check_question(body):
+    await _check_document(body.document)
+    if body.corpus:
+        for key in set(body.corpus) - await _corpus_keys():
+            raise HTTPException(404, f"unknown corpus document {key}")
+
+
+# ── DOCUMENTS ──────────────────────────────────────────────────────────────────
+@app.post("/documents")
+async def upload(file: UploadFile):
+    data = await file.read()
+    key  = await asyncio.to_thread(_engine().ingest, data, file.filename)
+    return await asyncio.to_thread(_engine().document_status, key)
+
+
+@app.get("/documents/{key}")
+async def document_status(key: str):
+    status = await asyncio.to_thread(_engine().document_status, key)
+    if status["state"] == "unknown":
+        raise HTTPException(404, f"unknown document {key}")
+    return status
+
+
+# ── SHARED CORPUS ──────────────────────────────────────────────────────────────
+@app.post("/corpus/documents")
+async def add_to_corpus(file: UploadFile):
+    data = await file.read()
+    key  = await asyncio.to_thread(_engine().add_to_corpus, data, file.filename)
+    return next(d for d in await asyncio.to_thread(_engine().corpus_documents) if d["key"] == key)
+
+
+@app.get("/corpus/documents")
+async def corpus_documents():
+    return await asyncio.to_thread(_engine().corpus_documents)
+
+
+@app.delete("/corpus/documents/{key}")
+async def remove_from_corpus(key: str):
+    if key not in await _corpus_keys():
+        raise HTTPException(404, f"unknown corpus document {key}")
+    if not await asyncio.to_thread(_engine().remove_from_corpus, key):
+        raise HTTPException(409, f"document {key} is still indexing")
+    return {"key": key, "state": "removed"}
+
+
+# ── QUESTIONS ──────────────────────────────────────────────────────────────────
+@app.post("/ask")
+async def ask(body: Question):
+    await _check_question(body)
+    return await _engine().aask(body.question, body.document, body.corpus)
+
+
+# Newline-delimited JSON, one engine event per line, ending with "done".
+@app.post("/ask/stream")
+async def ask_stream(body: Question):
+    await _check_question(body)
+
+    async def lines():
+        async for event in _engine().astream(body.question, body.document, body.corpus):
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# NDJSON, one result per question as it is answered (see Engine.batch); the
+# engine's pool runs the questions, this generator only relays them.
+@app.post("/ask/batch")
+async def ask_batch(body: Batch):
+    await _check_question(body)
+    if len(body.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(413, f"at most {BATCH_MAX_QUESTIONS} questions per batch")
+    results = _engine().batch(body.questions, body.document, body.corpus)
+    return StreamingResponse((json.dumps(r) + "\n" for r in results), media_type="application/x-ndjson")
+
+
+# ── METRICS ────────────────────────────────────────────────────────────────────
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=os.environ.get("RAG_HOST", "0.0.0.0"), port=int(os.environ.get("RAG_PORT", "8000")))